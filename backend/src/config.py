@@ -16,6 +16,8 @@ WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://localhost:8080")
 
 # --- Embedding Model Configuration --- #
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-mpnet-base-v2")
+# Size of the vectors EMBEDDING_MODEL_NAME produces; change it together with the model
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "768"))
 
 # --- Test Data Configuration --- #
 # Note: Paths read from env vars might need conversion to Path objects if needed
@@ -18,6 +18,11 @@ try:
     logger.info(f"Loading Sentence Transformer model: {model_name}")
     model = SentenceTransformer(model_name)
     logger.info(f"Sentence Transformer model '{model_name}' loaded successfully.")
+    if model.get_sentence_embedding_dimension() != config.EMBEDDING_DIMENSION:
+        logger.warning(
+            f"Model '{model_name}' produces {model.get_sentence_embedding_dimension()}-dimensional embeddings "
+            f"but EMBEDDING_DIMENSION is {config.EMBEDDING_DIMENSION}; imports will be rejected until they match."
+        )
 except Exception as e:
     logger.error(f"Failed to load Sentence Transformer model '{model_name}': {e}", exc_info=True)
     # Raise immediately so failure is clear if the module is imported
@@ -54,9 +59,10 @@ def generate_embeddings(chunks: List[DocumentChunk]) -> List[DocumentChunk]:
         # Generate embeddings. The model's encode method returns numpy arrays.
         embeddings_np = model.encode(texts_to_embed, show_progress_bar=True)
 
-        # Convert numpy arrays to lists and update chunks
-        for i, chunk in enumerate(chunks):
-            chunk.embedding = embeddings_np[i].tolist() # Convert numpy array to list for JSON serialization
+        # Convert the whole (N, dim) matrix to nested lists in one C-level call
+        # (lists for JSON serialization and the DocumentChunk schema), then update chunks
+        for chunk, embedding in zip(chunks, np.asarray(embeddings_np).tolist()):
+            chunk.embedding = embedding
 
         logger.info(f"Embeddings generated successfully for {len(chunks)} chunks.")
         return chunks
@@ -1,9 +1,12 @@
 import pdfplumber
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Any, Iterator, List, Tuple, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
 import logging
 import pytesseract
 from PIL import Image
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
 
 # logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 # Use getLogger instead, configuration is handled centrally
@@ -15,9 +18,85 @@ logger = logging.getLogger(__name__)
 MIN_TEXT_LENGTH_FOR_OCR_FALLBACK = 20 # If extract_text yields fewer chars than this, try OCR
 OCR_RESOLUTION = 300 # DPI for rendering PDF page to image for OCR
 
+def _fast_extract_page_texts(pdf_path: Path) -> Optional[List[str]]:
+    """Extracts the cleaned text layer of every page using pdfminer.six directly.
+
+    pdfplumber is built on top of pdfminer but wraps every character in its own
+    object model, which is wasted work for text-native pages. Returns None if
+    pdfminer cannot parse the file, so the caller can fall back to pdfplumber.
+    """
+    try:
+        page_texts: List[str] = []
+        for page_layout in extract_pages(pdf_path):
+            raw_text = ''.join(
+                element.get_text() for element in page_layout if isinstance(element, LTTextContainer)
+            )
+            page_texts.append(' '.join(raw_text.split()))
+        return page_texts
+    except Exception as e:
+        logger.warning(f"pdfminer fast path failed for {pdf_path.name}, falling back to pdfplumber: {e}")
+        return None
+
+def _extract_page_cheap(page) -> Tuple[str, Optional[Image.Image]]:
+    """Does all pdfplumber work for a page: direct text extraction and, if that text
+    is minimal, rendering the page image for OCR.
+
+    Returns the cleaned direct text and the rendered image (None if OCR is not needed
+    or rendering failed).
+    """
+    # 1. Attempt direct text extraction
+    direct_text = page.extract_text()
+    cleaned_direct_text = ' '.join(direct_text.split()) if direct_text else ""
+
+    # 2. Check if direct text is substantial or if OCR fallback is needed
+    if len(cleaned_direct_text) >= MIN_TEXT_LENGTH_FOR_OCR_FALLBACK:
+        return cleaned_direct_text, None
+
+    try:
+        # Render page to image at higher resolution
+        return cleaned_direct_text, page.to_image(resolution=OCR_RESOLUTION).original
+    except Exception as render_err:
+        logger.error(f"Rendering page {page.page_number} for OCR failed: {render_err}", exc_info=False)
+        return cleaned_direct_text, None
+
+def _prefetched_pages(pages: List[Any]) -> Iterator[Future]:
+    """Yields futures for _extract_page_cheap over `pages`, one page ahead.
+
+    Page N+1 is parsed (and rendered) on a worker thread while the caller runs OCR
+    on page N. All pdfplumber access happens on that single worker thread, since
+    pages share the underlying document and are not safe to parse concurrently.
+    """
+    if not pages:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(_extract_page_cheap, pages[0])
+        for next_page in pages[1:]:
+            next_future = executor.submit(_extract_page_cheap, next_page)
+            yield future
+            future = next_future
+        yield future
+
+def _ocr_page(page_image, cleaned_direct_text: str, page_num: int, pdf_name: str) -> str:
+    """Runs OCR on a rendered page, falling back to the minimal direct text on failure."""
+    logger.info(f"Direct text extraction minimal on page {page_num}. Attempting OCR.")
+    try:
+        # Perform OCR using English and Hindi
+        ocr_text = pytesseract.image_to_string(page_image, lang='eng+hin')
+        cleaned_ocr_text = ' '.join(ocr_text.split()) if ocr_text else ""
+        if not cleaned_ocr_text:
+            logger.warning(f"OCR yielded no text on page {page_num} of {pdf_name}")
+        return cleaned_ocr_text # Use OCR text if direct was minimal
+    except Exception as ocr_err:
+        logger.error(f"OCR failed on page {page_num} of {pdf_name}: {ocr_err}", exc_info=False)
+        # Fallback to the minimal direct text if OCR fails
+        return cleaned_direct_text
+
 def extract_text_from_pdf(pdf_path: Path) -> Optional[List[Tuple[int, str]]]:
     """Extracts text from each page of a PDF file, using OCR as a fallback.
 
+    The text layer is read with pdfminer.six first. pdfplumber is only opened
+    when at least one page has too little text and needs to be rendered for OCR.
+
     Args:
         pdf_path: The path to the PDF file.
 
@@ -27,66 +106,58 @@ def extract_text_from_pdf(pdf_path: Path) -> Optional[List[Tuple[int, str]]]:
         processed or does not exist.
     """
     if not pdf_path.is_file():
-        # logging.error(f"PDF file not found: {pdf_path}")
-        logger.error(f"PDF file not found: {pdf_path}") # Use logger instance
+        logger.error(f"PDF file not found: {pdf_path}")
         return None
 
+    fast_texts = _fast_extract_page_texts(pdf_path)
+
     extracted_data: List[Tuple[int, str]] = []
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # logging.info(f"Processing PDF: {pdf_path.name} with {len(pdf.pages)} pages.")
-            logger.info(f"Processing PDF: {pdf_path.name} with {len(pdf.pages)} pages.") # Use logger instance
-            for i, page in enumerate(pdf.pages):
-                page_num = i + 1
-                page_text = ""
-                try:
-                    # 1. Attempt direct text extraction
-                    direct_text = page.extract_text()
-                    cleaned_direct_text = ' '.join(direct_text.split()) if direct_text else ""
-
-                    # 2. Check if direct text is substantial or if OCR fallback is needed
-                    if len(cleaned_direct_text) < MIN_TEXT_LENGTH_FOR_OCR_FALLBACK:
-                        # logging.info(f"Direct text extraction minimal on page {page_num}. Attempting OCR.")
-                        logger.info(f"Direct text extraction minimal on page {page_num}. Attempting OCR.") # Use logger instance
-                        try:
-                            # Render page to image at higher resolution
-                            page_image = page.to_image(resolution=OCR_RESOLUTION).original
-                            # Perform OCR using English and Hindi
-                            ocr_text = pytesseract.image_to_string(page_image, lang='eng+hin')
-                            cleaned_ocr_text = ' '.join(ocr_text.split()) if ocr_text else ""
-                            page_text = cleaned_ocr_text # Use OCR text if direct was minimal
-                            if not page_text:
-                                # logging.warning(f"OCR yielded no text on page {page_num} of {pdf_path.name}")
-                                logger.warning(f"OCR yielded no text on page {page_num} of {pdf_path.name}") # Use logger instance
-                        except Exception as ocr_err:
-                            # logging.error(f"OCR failed on page {page_num} of {pdf_path.name}: {ocr_err}", exc_info=False)
-                            logger.error(f"OCR failed on page {page_num} of {pdf_path.name}: {ocr_err}", exc_info=False) # Use logger instance
-                            # Fallback to the minimal direct text if OCR fails
-                            page_text = cleaned_direct_text 
-                    else:
-                        page_text = cleaned_direct_text # Use directly extracted text
-
-                    if page_text:
-                        extracted_data.append((page_num, page_text))
-                        # logging.debug(f"Successfully processed page {page_num} (Length: {len(page_text)})")
-                        logger.debug(f"Successfully processed page {page_num} (Length: {len(page_text)})") # Use logger instance
-                    else:
-                        # logging.warning(f"No text found or extracted on page {page_num} of {pdf_path.name}")
-                        logger.warning(f"No text found or extracted on page {page_num} of {pdf_path.name}") # Use logger instance
-
-                except Exception as page_err:
-                    # logging.error(f"Error processing page {page_num} of {pdf_path.name}: {page_err}", exc_info=True)
-                    logger.error(f"Error processing page {page_num} of {pdf_path.name}: {page_err}", exc_info=True) # Use logger instance
-                    # Optionally skip page or handle error differently
-                    continue # Move to the next page
-
-            # logging.info(f"Successfully processed {len(extracted_data)} pages in {pdf_path.name}.")
-            logger.info(f"Successfully processed {len(extracted_data)} pages in {pdf_path.name}.") # Use logger instance
-            return extracted_data
+        if fast_texts is not None and all(len(text) >= MIN_TEXT_LENGTH_FOR_OCR_FALLBACK for text in fast_texts):
+            # Every page has a usable text layer: no need for pdfplumber at all
+            logger.info(f"Processing PDF: {pdf_path.name} with {len(fast_texts)} pages (text layer only).")
+            extracted_data = [(i + 1, text) for i, text in enumerate(fast_texts)]
+        else:
+            with pdfplumber.open(pdf_path) as pdf:
+                logger.info(f"Processing PDF: {pdf_path.name} with {len(pdf.pages)} pages.")
+
+                def has_fast_text(i: int) -> bool:
+                    return (fast_texts is not None and i < len(fast_texts)
+                            and len(fast_texts[i]) >= MIN_TEXT_LENGTH_FOR_OCR_FALLBACK)
+
+                # Only pages without a usable text layer go through pdfplumber
+                pending_pages = [page for i, page in enumerate(pdf.pages) if not has_fast_text(i)]
+                prefetched = _prefetched_pages(pending_pages)
+                for i in range(len(pdf.pages)):
+                    page_num = i + 1
+                    try:
+                        if has_fast_text(i):
+                            page_text = fast_texts[i] # Already extracted by the fast path
+                        else:
+                            cleaned_direct_text, page_image = next(prefetched).result()
+                            if page_image is not None:
+                                page_text = _ocr_page(page_image, cleaned_direct_text, page_num, pdf_path.name)
+                            else:
+                                page_text = cleaned_direct_text
+
+                        if page_text:
+                            extracted_data.append((page_num, page_text))
+                            logger.debug(f"Successfully processed page {page_num} (Length: {len(page_text)})")
+                        else:
+                            logger.warning(f"No text found or extracted on page {page_num} of {pdf_path.name}")
+
+                    except Exception as page_err:
+                        logger.error(f"Error processing page {page_num} of {pdf_path.name}: {page_err}", exc_info=True)
+                        continue # Move to the next page
+
+                # Shut the prefetch worker down before the PDF is closed
+                prefetched.close()
+
+        logger.info(f"Successfully processed {len(extracted_data)} pages in {pdf_path.name}.")
+        return extracted_data
 
     except Exception as e:
-        # logging.error(f"Error opening or processing PDF file {pdf_path}: {e}", exc_info=True)
-        logger.error(f"Error opening or processing PDF file {pdf_path}: {e}", exc_info=True) # Use logger instance
+        logger.error(f"Error opening or processing PDF file {pdf_path}: {e}", exc_info=True)
         return None
 
 if __name__ == '__main__':
@@ -3,7 +3,8 @@ import shutil
 import logging
 import hashlib
 from pathlib import Path
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from typing import List, Tuple
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware # Import CORS Middleware
 from contextlib import contextmanager
 import weaviate
@@ -14,7 +15,8 @@ import re # Import regex module
 
 # Import pipeline components and exceptions
 from .main_pipeline import process_pdf
-from .vector_db.weaviate_client import CLASS_NAME, get_weaviate_client, ensure_schema_exists, batch_import_chunks
+from .vector_db.weaviate_client import CLASS_NAME, get_weaviate_client, close_weaviate_client, ensure_schema_exists, batch_import_chunks
+from .rag.vector_store import clear_retrieval_cache
 from .exceptions import (
     PipelineError,
     PDFProcessingError,
@@ -83,14 +85,24 @@ def temporary_file_path(upload_file: UploadFile) -> Path:
                  logger.error(f"Error deleting temporary file {temp_file.name}: {e}")
 
 
-async def calculate_file_hash(upload_file: UploadFile) -> str:
-    """Calculates SHA256 hash of the UploadFile content efficiently."""
+# Read size when hashing uploads: large enough that a multi-MB PDF takes a handful
+# of reads (each UploadFile.read may hop to a worker thread), small enough to bound memory.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+async def calculate_file_hash(upload_file: UploadFile) -> Tuple[str, bytes]:
+    """Calculates SHA256 hash of the UploadFile content efficiently.
+
+    Returns the hex digest together with the file content, collected from the
+    same reads, so callers that need the bytes don't read the upload a second time.
+    """
     hasher = hashlib.sha256()
+    chunks = []
     upload_file.file.seek(0) # Ensure we read from the beginning
-    while chunk := await upload_file.read(8192): # Read in 8KB chunks
+    while chunk := await upload_file.read(HASH_CHUNK_SIZE): # Read in 1 MiB chunks
         hasher.update(chunk)
+        chunks.append(chunk)
     upload_file.file.seek(0) # Reset pointer for potential later use
-    return hasher.hexdigest()
+    return hasher.hexdigest(), b"".join(chunks)
 
 async def check_hash_exists(client: weaviate.WeaviateClient, file_hash: str) -> bool:
     """Checks if any object with the given document_hash exists in Weaviate."""
@@ -115,36 +127,36 @@ async def health_check():
     """Basic health check endpoint."""
     return {"status": "ok"}
 
+def _set_status_headers(response: Response, status: str, file_hash: str):
+    """Mirrors the /process-pdf status and document hash into response headers."""
+    response.headers["X-Yojna-Status"] = status
+    response.headers["X-Yojna-Document-Hash"] = file_hash
+
 @app.post("/process-pdf", tags=["Processing"], status_code=200) # Change default success to 200 OK
-async def process_pdf_endpoint(background_tasks: BackgroundTasks, pdf_file: UploadFile = File(...)):
+async def process_pdf_endpoint(background_tasks: BackgroundTasks, response: Response, pdf_file: UploadFile = File(...)):
     """
     Accepts a PDF file. Checks if it has been processed before (via hash).
     If not, schedules the full processing pipeline (extract, chunk, embed,
     store in Weaviate) to run in the background and returns an immediate
     acknowledgement. If already processed, returns status indicating that.
+
+    The status and document hash are also sent as the X-Yojna-Status and
+    X-Yojna-Document-Hash headers so bulk clients can skip decoding the body.
     """
     logger.info(f"Received request to process PDF: {pdf_file.filename}")
-    weaviate_client_checker = None
-
     try:
         # --- 1. Calculate Hash --- #
-        file_hash = await calculate_file_hash(pdf_file)
+        file_hash, pdf_content = await calculate_file_hash(pdf_file)
         logger.info(f"Calculated SHA256 hash for {pdf_file.filename}: {file_hash[:8]}...{file_hash[-8:]}")
 
         # --- 2. Check for Existence using Hash --- #
-        try:
-            weaviate_client_checker = get_weaviate_client()
-            exists = await check_hash_exists(weaviate_client_checker, file_hash)
-        finally:
-            if weaviate_client_checker:
-                try:
-                    weaviate_client_checker.close()
-                    logger.debug("Closed Weaviate client used for hash check.")
-                except Exception as ce:
-                    logger.error(f"Error closing Weaviate hash check client: {ce}")
+        # The shared client stays open for later requests (closed on shutdown)
+        weaviate_client_checker = get_weaviate_client()
+        exists = await check_hash_exists(weaviate_client_checker, file_hash)
 
         if exists:
             logger.info(f"Document {pdf_file.filename} with hash {file_hash[:8]}... already exists. Skipping processing.")
+            _set_status_headers(response, "exists", file_hash)
             return {
                 "filename": pdf_file.filename,
                 "status": "exists",
@@ -156,13 +168,13 @@ async def process_pdf_endpoint(background_tasks: BackgroundTasks, pdf_file: Uplo
         logger.info(f"Document {pdf_file.filename} (hash: {file_hash[:8]}...) not found. Scheduling for processing.")
         # Pass the file *content* and original filename/hash to the background task
         # Avoid passing the UploadFile object itself directly
-        # Read content before background task starts to ensure it's available
-        pdf_content = await pdf_file.read()
+        # The content was captured while hashing, so the upload isn't read again
         await pdf_file.close() # Close the upload file handle
 
         background_tasks.add_task(run_processing_pipeline, pdf_content, pdf_file.filename, file_hash)
 
         # Return 202 Accepted status code now
+        _set_status_headers(response, "processing_scheduled", file_hash)
         return {
             "filename": pdf_file.filename,
             "status": "processing_scheduled",
@@ -183,14 +195,13 @@ async def process_pdf_endpoint(background_tasks: BackgroundTasks, pdf_file: Uplo
 def run_processing_pipeline(pdf_content: bytes, original_filename: str, file_hash: str):
     """Background task to process a PDF and store results in Weaviate."""
     logger.info(f"Background task started for {original_filename} (hash: {file_hash[:8]}...).")
-    weaviate_client_processor = None
 
     # Use a temporary file context manager within the background task
     temp_pdf_path_obj = None
     try:
         # Create a temporary file to store the content for processing
-        suffix = Path(original_filename).suffix
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix=f"bg_{Path(original_filename).stem}_", mode='wb') as temp_file:
+        original_path = Path(original_filename)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=original_path.suffix, prefix=f"bg_{original_path.stem}_", mode='wb') as temp_file:
             temp_file.write(pdf_content)
             temp_pdf_path_str = temp_file.name
             temp_pdf_path_obj = Path(temp_pdf_path_str)
@@ -219,6 +230,8 @@ def run_processing_pipeline(pdf_content: bytes, original_filename: str, file_has
 
         # Pass the document_hash to batch_import_chunks
         batch_import_chunks(weaviate_client_processor, chunks_to_import, file_hash)
+        # Cached retrieval results predate the new chunks
+        clear_retrieval_cache()
         logger.info(f"Background task: Successfully stored {len(chunks_to_import)} chunks for {original_filename} (hash: {file_hash[:8]}...).")
 
     # --- Specific Error Handling for Background Task ---
@@ -235,16 +248,11 @@ def run_processing_pipeline(pdf_content: bytes, original_filename: str, file_has
         logger.critical(f"Background task unexpected critical error for {original_filename} (hash: {file_hash[:8]}...): {e}", exc_info=True)
     finally:
         # --- Cleanup ---
-        if weaviate_client_processor:
-            try:
-                weaviate_client_processor.close()
-                logger.info(f"Background task closed Weaviate processor client for {original_filename}.")
-            except Exception as ce:
-                logger.error(f"Background task error closing Weaviate processor client for {original_filename}: {ce}", exc_info=True)
+        # The Weaviate client is the shared one and stays open (closed on shutdown)
         # --- Delete Temporary File created by Background Task ---
-        if temp_pdf_path_obj and temp_pdf_path_obj.exists():
+        if temp_pdf_path_obj:
             try:
-                temp_pdf_path_obj.unlink()
+                temp_pdf_path_obj.unlink(missing_ok=True) # One syscall instead of exists() + unlink()
                 logger.info(f"Background task deleted temporary file: {temp_pdf_path_obj}")
             except OSError as e:
                 logger.error(f"Background task error deleting temporary file {temp_pdf_path_obj}: {e}")
@@ -257,7 +265,6 @@ from .schemas import ChatQuery, ChatResponse # Import chat schemas
 from .rag.chain import create_conversational_rag_chain
 # Import LangChain message types for history formatting
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from typing import List, Tuple
 
 # Import suggested questions schemas and service
 from .schemas import SuggestedQuestionsRequest, SuggestedQuestionsResponse, SuggestedQuestion
@@ -270,6 +277,15 @@ from .services.suggestion_service import generate_suggestions
 # For now, keeping initialization per-request for safety, can optimize later.
 # conversational_rag_chain = create_conversational_rag_chain()
 
+# Monetary amounts in LLM answers: ₹ symbol or Rs/Rs./INR, digits with commas,
+# optional decimals and an optional lakh/हज़ार/crore unit. Compiled once at import.
+_AMOUNT_RE = re.compile(r'(₹|Rs\.?|INR)\s*[\d,]+(?:\.\d+)?(?:\s*(?:lakh|lakhs|हज़ार|crore))?')
+# Sentence terminators in English and Hindi (. ! ? and the danda ।)
+_SENTENCE_END_RE = re.compile(r'[.!?।]')
+# Every _AMOUNT_RE match starts with one of these; a plain substring check rules
+# out most answers (no amount at all) without running the regex
+_AMOUNT_MARKERS = ("₹", "Rs", "INR")
+
 def format_response(llm_response: str, language: str = "hi") -> str:
     """
     Formats the LLM response to highlight entitlement amounts.
@@ -281,32 +297,28 @@ def format_response(llm_response: str, language: str = "hi") -> str:
     Returns:
         Formatted response with highlighted monetary values
     """
-    # Extract entitlement amounts with regex (supporting commas)
-    # Looks for ₹ symbol or Rs/Rs. followed by optional space, digits/commas
-    amounts = re.findall(r'(₹|Rs\.?|INR)\s*[\d,]+(?:\.\d+)?(?:\s*(?:lakh|lakhs|हज़ार|crore))?', llm_response)
-    
-    if not amounts:
+    if not any(marker in llm_response for marker in _AMOUNT_MARKERS):
         return llm_response
-        
-    # Get the first amount match
-    amount_match = re.search(r'(₹|Rs\.?|INR)\s*[\d,]+(?:\.\d+)?(?:\s*(?:lakh|lakhs|हज़ार|crore))?', llm_response)
+    
+    # Find the first entitlement amount with regex (supporting commas)
+    # Looks for ₹ symbol or Rs/Rs. followed by optional space, digits/commas
+    amount_match = _AMOUNT_RE.search(llm_response)
     if not amount_match:
         return llm_response
         
     first_amount = amount_match.group(0)
     
-    # Check if the first sentence already contains the amount
-    # Split by potential sentence terminators (. ! ? ।)
-    first_sentence = re.split(r'[.!?।]', llm_response, 1)[0]
+    # Check if the first sentence already contains the amount: it does exactly when
+    # the first match ends before the first sentence terminator (. ! ? ।)
+    sentence_end = _SENTENCE_END_RE.search(llm_response)
+    in_first_sentence = sentence_end is None or amount_match.end() <= sentence_end.start()
     
-    # Highlight all monetary amounts with bold HTML tags
-    highlighted_response = llm_response
-    for amount_pattern in re.finditer(r'(₹|Rs\.?|INR)\s*[\d,]+(?:\.\d+)?(?:\s*(?:lakh|lakhs|हज़ार|crore))?', llm_response):
-        amount = amount_pattern.group(0)
-        highlighted_response = highlighted_response.replace(amount, f"<strong>{amount}</strong>")
+    # Highlight all monetary amounts with bold HTML tags in a single substitution pass
+    # (replacing each match across the whole string was quadratic and wrapped repeated amounts twice)
+    highlighted_response = _AMOUNT_RE.sub(r'<strong>\g<0></strong>', llm_response)
     
     # If the first amount is not in the first sentence, prepend it
-    if first_amount not in first_sentence:
+    if not in_first_sentence:
         if language.lower() == "hi":
             return f"आपको <strong>{first_amount}</strong> की राशि मिल सकती है। {highlighted_response}"
         else:
@@ -441,12 +453,12 @@ async def startup_event():
     If connection or schema check fails, logs FATAL error and exits.
     """
     logger.info("Starting Yojna Khojna API...")
-    client = None
     try:
         logger.info("Connecting to Weaviate to ensure schema exists...")
         client = get_weaviate_client()
         ensure_schema_exists(client) # Ensure schema exists and is up-to-date
         logger.info("Weaviate connection and schema check successful.")
+        # The client stays open: it is the shared one the request handlers reuse
     except (WeaviateConnectionError, WeaviateSchemaError) as e:
         logger.error(f"FATAL: Failed to connect to Weaviate or ensure schema during startup: {e}", exc_info=True)
         # Exit the application if critical setup fails
@@ -457,9 +469,11 @@ async def startup_event():
     # except Exception as e:
     #     logger.error(f"FATAL: Unexpected error during startup: {e}", exc_info=True)
     #     sys.exit(f"Startup failed due to unexpected error: {e}")
-    finally:
-        if client and client.is_connected():
-            client.close()
-            logger.info("Closed Weaviate client connection after startup check.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Closes the shared Weaviate client."""
+    close_weaviate_client()
+    logger.info("Closed shared Weaviate client connection.")
 
 # Add more endpoints later 
\ No newline at end of file
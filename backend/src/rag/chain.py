@@ -1,14 +1,18 @@
 """Core RAG chain setup and execution logic."""
 
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel, RunnableLambda
+from langchain_core.runnables import RunnablePassthrough, RunnableParallel, RunnableLambda, RunnableBranch
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.documents import Document
 from typing import List, Dict, Any, Tuple
 import spacy # Import spacy
+import asyncio
 import logging # Import logging
+import os
 import re # Import re for regex
+import threading
+from functools import lru_cache
 
 # Import the retriever function from our vector store module
 from .vector_store import get_retriever
@@ -25,11 +29,23 @@ from langchain.chains.combine_documents import create_stuff_documents_chain
 # --- Setup Logging ---
 logger = logging.getLogger(__name__)
 
+# --- Retrieval Configuration --- #
+# When set, entity extraction and follow-up searches are skipped if every initial
+# result scores at least this much (Weaviate hybrid score, higher is better).
+# Unset by default: the score scale depends on the fusion settings and must be tuned.
+_strong_match_env = os.getenv("STRONG_MATCH_MIN_SCORE")
+STRONG_MATCH_MIN_SCORE = float(_strong_match_env) if _strong_match_env else None
+# Set ENTITY_FOLLOW_UPS=false to replace entity expansion with a single deeper
+# search of DEEP_RETRIEVAL_K results (for comparing recall against the expansion path).
+ENTITY_FOLLOW_UPS = os.getenv("ENTITY_FOLLOW_UPS", "true").lower() != "false"
+DEEP_RETRIEVAL_K = int(os.getenv("DEEP_RETRIEVAL_K", "10"))
+# Characters of each retrieved document scanned for entities
+ENTITY_DOC_CHARS = 500
+
 # --- Load spaCy Model --- #
 # Load the multilingual model downloaded by the user
-# Using a simple global variable for simplicity here.
+# The loaded model (or None on failure) is cached by get_spacy_nlp.
 # Consider a more robust approach (e.g., FastAPI lifespan event) for production.
-_nlp = None
 # Change from English-only model to multilingual model
 SPACY_MODEL_NAME = "xx_ent_wiki_sm"  # Multilingual model that supports Hindi
 
@@ -110,27 +126,116 @@ SCHEME_ENTITIES = {
     ]
 }
 
+# --- Precompiled Entity Patterns --- #
+# Compiled once at import instead of on every extraction call.
+# Scheme names, e.g. "Awas Yojana" or "प्रधानमंत्री Kisan"
+_SCHEME_NAME_RE = re.compile(
+    r'(?:[A-Za-z\s]+\s+)?(?:योजना|scheme|yojana)s?|(?:प्रधानमंत्री|मुख्यमंत्री|PM|CM)\s+[A-Za-z\s]+',
+    re.IGNORECASE
+)
+# Monetary amounts, e.g. "₹ 4,00,000" or "6000 रुपये"
+_AMOUNT_RE = re.compile(r'₹\s*[\d,]+|[\d,]+\s*(?:रूपये|रुपये|रुपए|rupees?|rs\.?)', re.IGNORECASE)
+# Marker used to recognise an already-extracted (lowercased) monetary entity
+_CURRENCY_MARKER_RE = re.compile(r'₹|रूपये|रुपये|rupees|rs\.?')
+
+def _build_dictionary_matcher():
+    """Builds a single-pass matcher for the SCHEME_ENTITIES substring check.
+
+    Returns a pattern that, at every position of lowercased text, reports the
+    longest dictionary term starting there (via a lookahead, so overlapping
+    terms are all seen), and a map from each lowercased term to the entities it
+    contributes: the term, its bilingual pair, and every shorter dictionary
+    term contained in it (those share a start position and would otherwise be
+    shadowed by the longer match).
+    """
+    direct_hits: Dict[str, set] = {}
+    for terms in SCHEME_ENTITIES.values():
+        for term_index, term in enumerate(terms):
+            hits = direct_hits.setdefault(term.lower(), set())
+            hits.add(term)
+            # Hindi terms sit at even indexes with their English equivalent right after
+            partner_index = term_index + 1 if term_index % 2 == 0 else term_index - 1
+            if 0 <= partner_index < len(terms):
+                hits.add(terms[partner_index])
+
+    hits_by_term = {}
+    for lowered, hits in direct_hits.items():
+        closure = set(hits)
+        for other, other_hits in direct_hits.items():
+            if other != lowered and other in lowered:
+                closure |= other_hits
+        hits_by_term[lowered] = frozenset(closure)
+
+    alternation = "|".join(re.escape(term) for term in sorted(direct_hits, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))"), hits_by_term
+
+_DICTIONARY_TERM_RE, _DICTIONARY_HITS = _build_dictionary_matcher()
+
+def _build_category_term_patterns():
+    """Compiles one case-insensitive, word-bounded alternation per SCHEME_ENTITIES category.
+
+    Used by the regex fallback in place of one \\b-anchored search per term.
+    Like the dictionary matcher, each pattern reports the longest term at every
+    position through a lookahead, and maps the lowercased match to that term
+    plus any shorter term of the category that starts there and ends on a word
+    boundary (those would otherwise be shadowed by the longer match).
+    """
+    patterns = {}
+    for category, terms in SCHEME_ENTITIES.items():
+        hits_by_term: Dict[str, set] = {}
+        for term in terms:
+            hits = hits_by_term.setdefault(term.lower(), set())
+            hits.add(term)
+            for other in terms:
+                if other != term and re.match(r'\b' + re.escape(other) + r'\b', term, re.IGNORECASE):
+                    hits.add(other)
+        alternation = "|".join(re.escape(term) for term in sorted(hits_by_term, key=len, reverse=True))
+        pattern = re.compile(r'(?=\b(' + alternation + r')\b)', re.IGNORECASE)
+        patterns[category] = (pattern, {term: frozenset(hits) for term, hits in hits_by_term.items()})
+    return patterns
+
+_CATEGORY_TERM_PATTERNS = _build_category_term_patterns()
+
+# Serializes the first load: concurrent requests run the sync retrieval step
+# on worker threads, and lru_cache alone would let each of them load the model.
+_nlp_load_lock = threading.Lock()
+
 def get_spacy_nlp():
     """Loads and returns the spaCy NLP model."""
-    global _nlp
-    if _nlp is None:
-        try:
-            logger.info(f"Loading spaCy model: {SPACY_MODEL_NAME}...")
-            _nlp = spacy.load(SPACY_MODEL_NAME)
-            logger.info(f"spaCy model '{SPACY_MODEL_NAME}' loaded successfully.")
-        except OSError:
-            logger.error(f"spaCy model '{SPACY_MODEL_NAME}' not found. ")
-            logger.error(f"Please run: python -m spacy download {SPACY_MODEL_NAME}")
-            # Depending on requirements, either raise an error or return None
-            # Returning None will effectively disable NER-based entity extraction
-            # raise RuntimeError(f"spaCy model '{SPACY_MODEL_NAME}' not found.")
-            _nlp = None # Set explicitly to None on failure
-            logger.warning("Proceeding without spaCy NER capabilities.")
-        except Exception as e:
-             logger.error(f"An unexpected error occurred loading spaCy model '{SPACY_MODEL_NAME}': {e}", exc_info=True)
-             _nlp = None
-             logger.warning("Proceeding without spaCy NER capabilities.")
-    return _nlp
+    with _nlp_load_lock:
+        return _load_spacy_nlp()
+
+@lru_cache(maxsize=1)
+def _load_spacy_nlp():
+    """Loads the spaCy model once.
+
+    The result is cached, including a failed load (None), so a missing model
+    is only looked up once per process rather than on every query.
+    """
+    try:
+        logger.info(f"Loading spaCy model: {SPACY_MODEL_NAME}...")
+        nlp = spacy.load(SPACY_MODEL_NAME)
+        logger.info(f"spaCy model '{SPACY_MODEL_NAME}' loaded successfully.")
+        return nlp
+    except OSError:
+        logger.error(f"spaCy model '{SPACY_MODEL_NAME}' not found. ")
+        logger.error(f"Please run: python -m spacy download {SPACY_MODEL_NAME}")
+        # Depending on requirements, either raise an error or return None
+        # Returning None will effectively disable NER-based entity extraction
+        # raise RuntimeError(f"spaCy model '{SPACY_MODEL_NAME}' not found.")
+        logger.warning("Proceeding without spaCy NER capabilities.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred loading spaCy model '{SPACY_MODEL_NAME}': {e}", exc_info=True)
+        logger.warning("Proceeding without spaCy NER capabilities.")
+    return None
+
+def _entity_source_text(query: str, documents: List[Document]) -> str:
+    """Joins the query and the head of each document into one string for entity matching.
+
+    Document content is limited to ENTITY_DOC_CHARS to avoid processing very
+    large texts. The newline separators keep terms from matching across documents.
+    """
+    return query + "\n" + "\n".join([doc.page_content[:ENTITY_DOC_CHARS] for doc in documents])
 
 def extract_key_entities(query: str, documents: List[Document]) -> List[str]:
     """
@@ -144,9 +249,8 @@ def extract_key_entities(query: str, documents: List[Document]) -> List[str]:
 
     logger.debug(f"Running entity extraction on query and {len(documents)} documents.")
     
-    # Combine query and document text for analysis
-    # Limit document content to avoid processing very large texts
-    text_to_process = query + "\n" + "\n".join([doc.page_content[:500] for doc in documents])
+    # Combine query and document text so every pattern below runs once over one string
+    text_to_process = _entity_source_text(query, documents)
     
     # Process text with spaCy
     doc = nlp(text_to_process)
@@ -163,30 +267,19 @@ def extract_key_entities(query: str, documents: List[Document]) -> List[str]:
     
     # 2. Extract scheme names using pattern matching
     # This improves detection of scheme names that might not be recognized by general NER
-    scheme_name_pattern = r'(?:[A-Za-z\s]+\s+)?(?:योजना|scheme|yojana)s?|(?:प्रधानमंत्री|मुख्यमंत्री|PM|CM)\s+[A-Za-z\s]+'
-    scheme_matches = re.findall(scheme_name_pattern, text_to_process, re.IGNORECASE)
+    scheme_matches = _SCHEME_NAME_RE.findall(text_to_process)
     for match in scheme_matches:
         if len(match.strip()) > 5:  # Filter out very short matches
             entities.add(match.strip())
     
     # 3. Extract domain-specific entities using pattern matching
-    for category, terms in SCHEME_ENTITIES.items():
-        for term in terms:
-            if term.lower() in text_to_process.lower():
-                entities.add(term)
-                
-                # Also add any bilingual equivalents from the same category
-                term_index = terms.index(term)
-                # If term is at an even index, add the following odd index term (Hindi → English)
-                if term_index % 2 == 0 and term_index + 1 < len(terms):
-                    entities.add(terms[term_index + 1])
-                # If term is at an odd index, add the previous even index term (English → Hindi)
-                elif term_index % 2 == 1 and term_index - 1 >= 0:
-                    entities.add(terms[term_index - 1])
+    # One scan over the text finds every dictionary term, with its bilingual
+    # equivalent from the same category, instead of one substring scan per term
+    for match in _DICTIONARY_TERM_RE.finditer(text_to_process.lower()):
+        entities.update(_DICTIONARY_HITS[match.group(1)])
     
     # 4. Extract monetary amounts using regex
-    amount_pattern = r'₹\s*[\d,]+|[\d,]+\s*(?:रूपये|रुपये|रुपए|rupees?|rs\.?)'
-    amounts = re.findall(amount_pattern, text_to_process, re.IGNORECASE)
+    amounts = _AMOUNT_RE.findall(text_to_process)
     for amount in amounts:
         entities.add(amount.strip())
                 
@@ -222,7 +315,7 @@ def prioritize_entities(entities: List[str], query: str) -> List[str]:
             score += 4
             
         # Monetary amounts get high priority
-        if re.search(r'₹|रूपये|रुपये|rupees|rs\.?', entity.lower()):
+        if _CURRENCY_MARKER_RE.search(entity.lower()):
             score += 4
             
         # Category-based scoring
@@ -244,26 +337,23 @@ def prioritize_entities(entities: List[str], query: str) -> List[str]:
 
 def regex_entity_extraction(query: str, documents: List[Document]) -> List[str]:
     """Fallback entity extraction using regex patterns when spaCy is unavailable."""
-    # Combine text for analysis, limiting document length to avoid processing very large texts
-    text = query + "\n" + "\n".join([doc.page_content[:500] for doc in documents])
+    text = _entity_source_text(query, documents)
     entities = set()
     
-    # Extract entities using the scheme terminology
-    for category, terms in SCHEME_ENTITIES.items():
-        for term in terms:
-            if re.search(r'\b' + re.escape(term) + r'\b', text, re.IGNORECASE):
-                entities.add(term)
+    # Extract entities using the scheme terminology: one precompiled scan per category
+    # (case folding happens in the regex engine, so the text is not lowercased)
+    for pattern, hits_by_term in _CATEGORY_TERM_PATTERNS.values():
+        for match in pattern.finditer(text):
+            entities.update(hits_by_term.get(match.group(1).lower(), ()))
     
     # Extract scheme names
-    scheme_pattern = r'(?:[A-Za-z\s]+\s+)?(?:योजना|scheme|yojana)s?|(?:प्रधानमंत्री|मुख्यमंत्री|PM|CM)\s+[A-Za-z\s]+'
-    schemes = re.findall(scheme_pattern, text, re.IGNORECASE)
+    schemes = _SCHEME_NAME_RE.findall(text)
     for scheme in schemes:
         if len(scheme.strip()) > 5:
             entities.add(scheme.strip())
     
     # Extract monetary amounts
-    amount_pattern = r'₹\s*[\d,]+|[\d,]+\s*(?:रूपये|रुपये|रुपए|rupees?|rs\.?)'
-    amounts = re.findall(amount_pattern, text, re.IGNORECASE)
+    amounts = _AMOUNT_RE.findall(text)
     for amount in amounts:
         entities.add(amount.strip())
     
@@ -285,44 +375,118 @@ def deduplicate_chunks(documents: List[Document]) -> List[Document]:
     print(f"Deduplicated {len(documents)} chunks to {len(deduplicated)}.")
     return deduplicated
 
+def _is_strong_match(scored_results: List[Tuple[Document, float]]) -> bool:
+    """True when every initial hit clears STRONG_MATCH_MIN_SCORE."""
+    return bool(scored_results) and all(score >= STRONG_MATCH_MIN_SCORE for _, score in scored_results)
+
+def _build_follow_up_queries(entities: List[str]) -> List[str]:
+    """Creates contextual follow-up queries based on entity type."""
+    print(f"Enhanced Retrieval: Performing follow-up searches for entities: {entities}")
+    follow_up_queries = [generate_contextual_follow_up_query(entity) for entity in entities]
+    for follow_up_query in follow_up_queries:
+        print(f"Enhanced Retrieval: Follow-up query: '{follow_up_query}'")
+    return follow_up_queries
+
+def _merge_retrieval_results(initial_results: List[Document], entities: List[str],
+                             batch_results: List[Any]) -> List[Document]:
+    """Combines initial and follow-up results, skipping failed follow-ups, and deduplicates."""
+    related_chunks = []
+    for entity, related in zip(entities, batch_results):
+        if isinstance(related, Exception):
+            print(f"Enhanced Retrieval: Error during follow-up search for entity '{entity}': {related}")
+            # Continue with other entities if one fails
+            continue
+        print(f"Enhanced Retrieval: Found {len(related)} results for entity '{entity}'")
+        related_chunks.extend(related)
+
+    # Combine and deduplicate
+    all_chunks = initial_results + related_chunks
+    final_chunks = deduplicate_chunks(all_chunks)
+    print(f"Enhanced Retrieval: Returning {len(final_chunks)} final chunks.")
+    return final_chunks
+
 def enhanced_retrieval_step(input_dict: Dict[str, Any]) -> List[Document]:
     """Performs initial retrieval, entity extraction, follow-up retrieval, and deduplication."""
     query = input_dict["input"]  # The reformulated query from history_aware_retriever
+    if not ENTITY_FOLLOW_UPS:
+        # One deeper search in place of the initial search plus per-entity follow-ups
+        print(f"Enhanced Retrieval: Single search (k={DEEP_RETRIEVAL_K}) for query: '{query}'")
+        deep_results = get_retriever(search_kwargs={"k": DEEP_RETRIEVAL_K}).invoke(query)
+        return deduplicate_chunks(deep_results)
+
     retriever = get_retriever()  # Get the base retriever
     
     print(f"Enhanced Retrieval: Initial search for query: '{query}'")
-    initial_results = retriever.invoke(query)
-    print(f"Enhanced Retrieval: Found {len(initial_results)} initial results.")
+    if STRONG_MATCH_MIN_SCORE is not None:
+        scored_results = retriever.invoke_with_scores(query)
+        initial_results = [doc for doc, _ in scored_results]
+        print(f"Enhanced Retrieval: Found {len(initial_results)} initial results.")
+        if _is_strong_match(scored_results):
+            # Every hit is a strong match; expansion would only add weaker context
+            print("Enhanced Retrieval: Initial results are strong matches, skipping entity follow-ups.")
+            return deduplicate_chunks(initial_results)
+    else:
+        initial_results = retriever.invoke(query)
+        print(f"Enhanced Retrieval: Found {len(initial_results)} initial results.")
     
     # Extract domain-specific entities
     entities = extract_key_entities(query, initial_results)
     
-    related_chunks = []
+    batch_results = []
     if entities:
-        print(f"Enhanced Retrieval: Performing follow-up searches for entities: {entities}")
-        for entity in entities:
-            # Create contextual follow-up queries based on entity type
-            follow_up_query = generate_contextual_follow_up_query(entity)
-            print(f"Enhanced Retrieval: Follow-up query: '{follow_up_query}'")
-            
-            try:
-                # Use a slightly smaller k for related searches
-                related = retriever.invoke(follow_up_query)
-                print(f"Enhanced Retrieval: Found {len(related)} results for entity '{entity}'")
-                related_chunks.extend(related)
-            except Exception as e:
-                print(f"Enhanced Retrieval: Error during follow-up search for entity '{entity}': {e}")
-                # Continue with other entities if one fails
-        
-    # Combine and deduplicate
-    all_chunks = initial_results + related_chunks
-    final_chunks = deduplicate_chunks(all_chunks)
-    print(f"Enhanced Retrieval: Returning {len(final_chunks)} final chunks.")
-    
-    return final_chunks
+        # Send all follow-up queries as one batch instead of one invoke per entity.
+        # return_exceptions keeps a single failing entity from sinking the others.
+        batch_results = retriever.batch(_build_follow_up_queries(entities), return_exceptions=True)
+    return _merge_retrieval_results(initial_results, entities, batch_results)
+
+async def aenhanced_retrieval_step(input_dict: Dict[str, Any]) -> List[Document]:
+    """Async counterpart of enhanced_retrieval_step, used when the chain is awaited.
+
+    Retriever calls are awaited and the CPU-bound entity extraction runs on a
+    worker thread, so the event loop keeps serving other requests meanwhile.
+    """
+    query = input_dict["input"]
+    if not ENTITY_FOLLOW_UPS:
+        print(f"Enhanced Retrieval: Single search (k={DEEP_RETRIEVAL_K}) for query: '{query}'")
+        deep_results = await get_retriever(search_kwargs={"k": DEEP_RETRIEVAL_K}).ainvoke(query)
+        return deduplicate_chunks(deep_results)
+
+    retriever = get_retriever()
+
+    print(f"Enhanced Retrieval: Initial search for query: '{query}'")
+    if STRONG_MATCH_MIN_SCORE is not None:
+        scored_results = await asyncio.to_thread(retriever.invoke_with_scores, query)
+        initial_results = [doc for doc, _ in scored_results]
+        print(f"Enhanced Retrieval: Found {len(initial_results)} initial results.")
+        if _is_strong_match(scored_results):
+            print("Enhanced Retrieval: Initial results are strong matches, skipping entity follow-ups.")
+            return deduplicate_chunks(initial_results)
+    else:
+        initial_results = await retriever.ainvoke(query)
+        print(f"Enhanced Retrieval: Found {len(initial_results)} initial results.")
+
+    entities = await asyncio.to_thread(extract_key_entities, query, initial_results)
+
+    batch_results = []
+    if entities:
+        batch_results = await retriever.abatch(_build_follow_up_queries(entities), return_exceptions=True)
+    return _merge_retrieval_results(initial_results, entities, batch_results)
 
 def generate_contextual_follow_up_query(entity: str) -> str:
     """Generate a context-appropriate follow-up query based on entity type."""
+    # Dictionary terms are answered from the table built at import
+    known_query = _KNOWN_ENTITY_QUERIES.get(entity)
+    if known_query is not None:
+        return known_query
+    return _build_follow_up_query(entity)
+
+@lru_cache(maxsize=1024)
+def _build_follow_up_query(entity: str) -> str:
+    """Builds the follow-up query for an entity from its type keywords.
+
+    The result depends only on the entity string, so it is memoized; recurring
+    scheme names across turns skip the keyword checks.
+    """
     
     # Check entity type and build appropriate query
     # For schemes, focus on eligibility and benefits
@@ -342,7 +506,7 @@ def generate_contextual_follow_up_query(entity: str) -> str:
         return f"{entity} requirement application process procedure"
     
     # For monetary amounts, focus on which schemes provide this amount
-    elif re.search(r'₹|रूपये|रुपये|rupees|rs\.?', entity.lower()):
+    elif _CURRENCY_MARKER_RE.search(entity.lower()):
         return f"{entity} scheme योजना eligibility criteria who gets"
     
     # For disaster relief, focus on compensation and emergency assistance
@@ -353,6 +517,14 @@ def generate_contextual_follow_up_query(entity: str) -> str:
     else:
         return f"{entity} entitlement amount procedure documents eligibility welfare scheme योजना"
 
+# Follow-up queries for every domain dictionary term, precomputed once. Most
+# extracted entities come from SCHEME_ENTITIES, so they resolve with one dict lookup.
+_KNOWN_ENTITY_QUERIES = {
+    term: _build_follow_up_query.__wrapped__(term)
+    for terms in SCHEME_ENTITIES.values()
+    for term in terms
+}
+
 def create_conversational_rag_chain():
     """
     Builds and returns a conversational RAG chain that considers chat history
@@ -399,6 +571,13 @@ Reformulated Question:"""
     # Let's build the rephrasing chain manually.
     rephrase_chain = contextualize_q_prompt | llm | StrOutputParser()
 
+    # A first-turn question has no history to resolve against, so skip the
+    # rephrasing LLM round-trip and retrieve with the question as asked.
+    reformulate_if_history = RunnableBranch(
+        (lambda x: not x.get("chat_history"), RunnableLambda(lambda x: x["input"])),
+        rephrase_chain,
+    )
+
     # --- Answering Prompt (using retrieved context) ---
     # This prompt guides the LLM to answer based *only* on the provided context.
     QA_SYSTEM_PROMPT = """# Yojna Khojna Government Scheme Assistant
@@ -462,17 +641,22 @@ You are helping rural and underserved Indian citizens access government welfare
     # --- Full Conversational RAG Chain with Enhanced Retrieval ---
     # 1. Prepare input for rephrasing (includes history and latest input)
     # 2. Rephrase the input question using the LLM -> reformulated_query
+    #    (skipped when there is no chat history; the input is used as-is)
     # 3. Pass the reformulated_query to the enhanced_retrieval_step -> final_documents
     # 4. Pass the final_documents and the *original* input/history to the question_answer_chain
 
     conversational_rag_chain = (
         RunnablePassthrough.assign(
             # Step 2: Rephrase based on history
-            reformulated_input=rephrase_chain 
+            reformulated_input=reformulate_if_history
         )
         | RunnablePassthrough.assign(
             # Step 3: Retrieve docs using the reformulated input
-            context=RunnableLambda(lambda x: enhanced_retrieval_step({"input": x["reformulated_input"]}))
+            # ainvoke (the /chat endpoint) takes the async path; invoke stays synchronous
+            context=RunnableLambda(
+                lambda x: enhanced_retrieval_step({"input": x["reformulated_input"]}),
+                afunc=lambda x: aenhanced_retrieval_step({"input": x["reformulated_input"]}),
+            )
         )
         # Step 4: Generate answer using original input, history, and retrieved context
         | question_answer_chain 
@@ -1,11 +1,21 @@
 """Handles connection to Weaviate vector store and retriever setup."""
 
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
 import weaviate
 # Replace deprecated import with the new one
 # from langchain_community.vectorstores import Weaviate
 from langchain_weaviate import WeaviateVectorStore
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.documents import Document
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_core.retrievers import BaseRetriever
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 from dotenv import load_dotenv
 
@@ -18,6 +28,12 @@ WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://localhost:8080")
 WEAVIATE_CLASS_NAME = os.getenv("WEAVIATE_CLASS_NAME", "SchemeDocumentChunk")
 WEAVIATE_TEXT_KEY = os.getenv("WEAVIATE_TEXT_KEY", "text")
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-mpnet-base-v2")
+# Number of (query, search settings) results kept in memory; 0 disables the cache
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048"))
+# Seconds a cached result is served before Weaviate is asked again
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+# Upper bound on Weaviate searches a batch runs at once
+RETRIEVAL_SEARCH_WORKERS = int(os.getenv("RETRIEVAL_SEARCH_WORKERS", "8"))
 
 # --- Weaviate Client --- #
 _weaviate_client = None
@@ -82,7 +98,144 @@ def get_vector_store() -> WeaviateVectorStore:
         print("LangChain Weaviate vector store initialized.")
     return _vector_store
 
-def get_retriever(search_type="similarity", search_kwargs={"k": 3}) -> VectorStoreRetriever:
+# --- Retrieval Result Cache --- #
+# Follow-up queries such as "<scheme> पात्रता लाभ eligibility benefits ..." recur
+# across turns; a hit skips both the query embedding and the Weaviate round-trip.
+# Shared across retriever instances because get_retriever() builds a new one per call.
+# Entries are (expires_at, results) so a write made by another worker or process
+# is picked up once the TTL runs out.
+_retrieval_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, List[Any]]]" = OrderedDict()
+_retrieval_cache_lock = threading.Lock()
+# One pool for the per-query searches of every batch; its threads are started
+# lazily and reused, so batches neither spawn a pool each nor a thread per query
+_search_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_SEARCH_WORKERS, thread_name_prefix="weaviate-search")
+
+def clear_retrieval_cache():
+    """Drops all cached retrieval results (call after new documents are indexed).
+
+    Only this process's cache is cleared; other workers keep their entries
+    until RETRIEVAL_CACHE_TTL_SECONDS expires them.
+    """
+    with _retrieval_cache_lock:
+        _retrieval_cache.clear()
+
+class CachingRetriever(BaseRetriever):
+    """Wraps a retriever with an in-memory LRU cache of results keyed by query and search settings.
+
+    A LangChain retriever, so it composes like the VectorStoreRetriever it wraps.
+    The cache is per process: clear_retrieval_cache() invalidates it after this
+    process indexes documents, and entries expire after ttl seconds so writes from
+    other processes show up eventually. Lookups and inserts are guarded by a lock
+    because batch() fans out over worker threads.
+    """
+
+    inner: Any # The wrapped VectorStoreRetriever
+    search_type: str
+    search_kwargs: Dict[str, Any]
+    maxsize: int = RETRIEVAL_CACHE_SIZE
+    ttl: float = RETRIEVAL_CACHE_TTL_SECONDS
+    _settings_key: Tuple[Any, ...] = PrivateAttr()
+
+    def __init__(self, inner: VectorStoreRetriever, search_type: str, search_kwargs: Dict[str, Any], **kwargs: Any):
+        super().__init__(inner=inner, search_type=search_type, search_kwargs=dict(search_kwargs), **kwargs)
+        self._settings_key = (search_type, tuple(sorted((k, repr(v)) for k, v in search_kwargs.items())))
+
+    def _lookup(self, key: Tuple[Any, ...]):
+        with _retrieval_cache_lock:
+            entry = _retrieval_cache.get(key)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at <= time.monotonic():
+                del _retrieval_cache[key]
+                return None
+            _retrieval_cache.move_to_end(key)
+        return results
+
+    def _store(self, key: Tuple[Any, ...], results: List[Any]):
+        if self.maxsize <= 0:
+            return
+        with _retrieval_cache_lock:
+            _retrieval_cache[key] = (time.monotonic() + self.ttl, results)
+            _retrieval_cache.move_to_end(key)
+            while len(_retrieval_cache) > self.maxsize:
+                _retrieval_cache.popitem(last=False)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        key = (query, self._settings_key)
+        docs = self._lookup(key)
+        if docs is None:
+            docs = self.inner.invoke(query, {"callbacks": run_manager.get_child()})
+            self._store(key, docs)
+        # Hand out a copy so callers cannot mutate the cached list
+        return list(docs)
+
+    async def abatch(self, queries: List[str], config=None, *, return_exceptions: bool = False,
+                     **kwargs) -> List[Any]:
+        return await asyncio.to_thread(self.batch, queries, config, return_exceptions=return_exceptions, **kwargs)
+
+    def invoke_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """Returns (document, score) pairs for a query; Weaviate hybrid scores, higher is better."""
+        key = (query, self._settings_key, "scored")
+        scored = self._lookup(key)
+        if scored is None:
+            scored = self.inner.vectorstore.similarity_search_with_score(query, **self.search_kwargs)
+            self._store(key, scored)
+        return list(scored)
+
+    def batch(self, queries: List[str], config=None, *, return_exceptions: bool = False, **kwargs) -> List[Any]:
+        results: List[Any] = [None] * len(queries)
+        misses = []
+        for i, query in enumerate(queries):
+            key = (query, self._settings_key)
+            docs = self._lookup(key)
+            if docs is None:
+                misses.append((i, key, query))
+            else:
+                results[i] = list(docs)
+        if misses:
+            fetched = self._fetch_batch([query for _, _, query in misses], config,
+                                        return_exceptions=return_exceptions, **kwargs)
+            for (i, key, _), docs in zip(misses, fetched):
+                if not isinstance(docs, Exception):
+                    # Failures are returned to the caller but never cached
+                    self._store(key, docs)
+                    docs = list(docs)
+                results[i] = docs
+        return results
+
+    def _fetch_batch(self, queries: List[str], config, *, return_exceptions: bool, **kwargs) -> List[Any]:
+        """Runs uncached queries, embedding them in one batched call for similarity search.
+
+        VectorStoreRetriever.batch would call embed_query once per query; here
+        the whole batch goes through a single embed_documents forward pass and
+        each search reuses its precomputed vector.
+        """
+        vector_store = getattr(self.inner, "vectorstore", None)
+        embeddings = getattr(vector_store, "embeddings", None)
+        if self.search_type != "similarity" or embeddings is None or len(queries) < 2:
+            return self.inner.batch(queries, config, return_exceptions=return_exceptions, **kwargs)
+
+        try:
+            vectors = embeddings.embed_documents(queries)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return [e] * len(queries)
+
+        def search(query_and_vector):
+            query, vector = query_and_vector
+            try:
+                # Weaviate runs a hybrid query: the text feeds BM25, the vector skips re-embedding
+                return vector_store.similarity_search(query, vector=vector, **self.search_kwargs)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        return list(_search_executor.map(search, zip(queries, vectors)))
+
+def get_retriever(search_type="similarity", search_kwargs={"k": 3}) -> CachingRetriever:
     """Creates and returns a LangChain retriever for the Weaviate vector store.
 
     Args:
@@ -90,7 +243,7 @@ def get_retriever(search_type="similarity", search_kwargs={"k": 3}) -> VectorSto
         search_kwargs (dict): Keyword arguments for the search (e.g., {"k": 3} for top 3 results).
 
     Returns:
-        VectorStoreRetriever: The configured LangChain retriever.
+        CachingRetriever: The configured LangChain retriever behind the shared result cache.
     """
     vector_store = get_vector_store()
     retriever = vector_store.as_retriever(
@@ -98,7 +251,7 @@ def get_retriever(search_type="similarity", search_kwargs={"k": 3}) -> VectorSto
         search_kwargs=search_kwargs
     )
     print(f"Weaviate retriever configured: type={search_type}, kwargs={search_kwargs}")
-    return retriever
+    return CachingRetriever(retriever, search_type, search_kwargs)
 
 # --- Example Usage (for testing) --- #
 if __name__ == '__main__':
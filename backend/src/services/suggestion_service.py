@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import uuid
 import re
-from typing import List, Dict, Any, Tuple, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Optional, Union
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import PromptTemplate
 from langchain_anthropic import ChatAnthropic
@@ -92,45 +94,95 @@ TEMPLATE_TRANSLATIONS = {
     }
 }
 
+# Values for the template placeholders other than {scheme}
+TEMPLATE_DEFAULTS = {
+    "situation": "my situation",
+    "category": "my category",
+    "document": "Aadhaar card",
+    "demographic": "my demographic",
+    "circumstance": "circumstances"
+}
+
+def _prefill_templates() -> Dict[Tuple[str, str], str]:
+    """Translates each category's first template and fills every placeholder except
+    {scheme} once at import, keyed by (category, language).
+
+    generate_template_questions then only substitutes the scheme name instead of
+    translating and re-parsing a format string per question.
+    """
+    prefilled = {}
+    for category, category_data in QUESTION_CATEGORIES.items():
+        template = category_data["templates"][0]  # Default to first template
+        for language, translations in TEMPLATE_TRANSLATIONS.items():
+            translated = translations.get(template, template)
+            try:
+                prefilled[(category, language)] = translated.format(scheme="{scheme}", **TEMPLATE_DEFAULTS)
+            except KeyError as e:
+                logger.error(f"Error filling template {translated}: {e}")
+    return prefilled
+
+_PREFILLED_TEMPLATES = _prefill_templates()
+
 # Entity extraction regex patterns
 SCHEME_NAME_PATTERN = r'((?:[A-Z][a-z]+ )+Yojana|(?:[A-Z][a-z]+ )+Scheme|(?:[A-Z][a-z]+ )+योजना)'
 AMOUNT_PATTERN = r'(₹|Rs\.?)\s*[\d,]+(?:\.\d+)?(?:\s*(?:lakh|lakhs|हज़ार|crore))?'
 DOCUMENT_PATTERN = r'(Aadhaar|PAN|ration card|income certificate|caste certificate|आधार|पैन कार्ड|राशन कार्ड)'
 
-def extract_entities(text: str) -> Dict[str, List[str]]:
+# Compiled once at import; extract_entities runs on every suggestion request
+_SCHEME_NAME_RE = re.compile(SCHEME_NAME_PATTERN)
+_AMOUNT_RE = re.compile(AMOUNT_PATTERN)
+_DOCUMENT_RE = re.compile(DOCUMENT_PATTERN)
+# Any character in the Devanagari block marks the text as Hindi
+_DEVANAGARI_RE = re.compile(r'[\u0900-\u097F]')
+
+class Entities:
+    """Scheme names, amounts and document names extracted from a conversation turn.
+
+    A slotted record instead of a dict of lists; item access (entities["schemes"])
+    is kept so callers that pass or expect the dict form keep working.
+    """
+    __slots__ = ("schemes", "amounts", "documents")
+
+    def __init__(self, schemes: List[str], amounts: List[str], documents: List[str]):
+        self.schemes = schemes
+        self.amounts = amounts
+        self.documents = documents
+
+    def __getitem__(self, key: str) -> List[str]:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"Entities(schemes={self.schemes!r}, amounts={self.amounts!r}, documents={self.documents!r})"
+
+def extract_entities(text: str) -> Entities:
     """Extract entities like scheme names, amounts, etc. from text."""
-    entities = {
-        "schemes": [],
-        "amounts": [],
-        "documents": []
-    }
-    
     # Extract scheme names
-    scheme_matches = re.findall(SCHEME_NAME_PATTERN, text)
-    entities["schemes"] = list(set(scheme_matches))
+    schemes = list(set(_SCHEME_NAME_RE.findall(text)))
     
     # Extract monetary amounts
-    amount_matches = re.findall(AMOUNT_PATTERN, text)
-    entities["amounts"] = list(set(amount_matches))
+    amounts = list(set(_AMOUNT_RE.findall(text)))
     
     # Extract document names
-    document_matches = re.findall(DOCUMENT_PATTERN, text)
-    entities["documents"] = list(set(document_matches))
+    documents = list(set(_DOCUMENT_RE.findall(text)))
+    
+    entities = Entities(schemes, amounts, documents)
     
     logger.debug(f"Extracted entities: {entities}")
     return entities
 
 def detect_language(text: str) -> str:
     """Detect language of the text (simplified version)."""
-    # Check for Hindi characters
-    if re.search(r'[\u0900-\u097F]', text):
+    # Check for Hindi characters (a single character-class scan in C, stops at the first hit)
+    if _DEVANAGARI_RE.search(text):
         return "hi"
     return "en"
 
 def generate_template_questions(
     question: str, 
     answer: str, 
-    entities: Dict[str, List[str]], 
+    entities: Union[Entities, Dict[str, List[str]]], 
     language: str = "en"
 ) -> List[SuggestedQuestion]:
     """Generate questions based on templates and extracted entities."""
@@ -165,61 +217,35 @@ def generate_template_questions(
     
     # For each category, generate a question
     for category in selected_categories:
-        category_data = QUESTION_CATEGORIES[category]
-        templates = category_data["templates"]
-        
-        # Select a template
-        template = templates[0]  # Default to first template
-        
-        # Try to translate the template
-        if language in TEMPLATE_TRANSLATIONS and template in TEMPLATE_TRANSLATIONS[language]:
-            template = TEMPLATE_TRANSLATIONS[language][template]
+        # Translated template with everything but the scheme filled in; languages
+        # without translations use the untranslated (English) template
+        template = _PREFILLED_TEMPLATES.get((category, language), _PREFILLED_TEMPLATES.get((category, "en")))
+        if template is None:
+            continue
         
-        # Fill in template with entity values
-        try:
-            filled_question = template.format(
-                scheme=scheme,
-                situation="my situation",
-                category="my category",
-                document="Aadhaar card",
-                demographic="my demographic",
-                circumstance="circumstances"
-            )
-            
-            question_id = str(uuid.uuid4())
-            suggested_questions.append(
-                SuggestedQuestion(id=question_id, text=filled_question)
-            )
-        except KeyError as e:
-            logger.error(f"Error filling template {template}: {e}")
+        filled_question = template.replace("{scheme}", scheme)
+        question_id = str(uuid.uuid4())
+        suggested_questions.append(
+            SuggestedQuestion(id=question_id, text=filled_question)
+        )
     
     return suggested_questions
 
-async def generate_contextual_questions(
-    question: str, 
-    answer: str, 
-    chat_history: List[Dict[str, str]], 
-    llm: Optional[ChatAnthropic] = None,
-    language: str = "en"
-) -> List[SuggestedQuestion]:
-    """Generate contextual follow-up questions using LLM."""
-    if llm is None:
-        llm = ChatAnthropic(
-            model="claude-3-sonnet-20240229",
-            temperature=0.2,
-            max_tokens=4000
-        )
-    
-    # Format chat history for the prompt
-    formatted_history = ""
-    for msg in chat_history:
-        if msg["role"] == "user":
-            formatted_history += f"User: {msg['content']}\n"
-        else:
-            formatted_history += f"Assistant: {msg['content']}\n"
-    
-    # Update prompt to specify exactly 4 questions and emphasize language matching
-    prompt_template = """You are an AI assistant helping users navigate government schemes in India. 
+def _render_history(chat_history: List[Dict[str, str]]) -> str:
+    """Renders chat history as "User: ..." / "Assistant: ..." lines.
+
+    Built with a single join: repeated string += copies the growing prefix on
+    every turn, which is quadratic in the conversation length.
+    """
+    return "".join(
+        f"User: {msg['content']}\n" if msg["role"] == "user" else f"Assistant: {msg['content']}\n"
+        for msg in chat_history
+    )
+
+# Prompt for contextual follow-up questions: asks for exactly 4 questions and
+# emphasizes language matching. Parsed once at import rather than per request.
+CONTEXTUAL_QUESTIONS_PROMPT = PromptTemplate(
+    template="""You are an AI assistant helping users navigate government schemes in India. 
 Based on the conversation history and the most recent query and answer, suggest exactly 4 relevant follow-up questions 
 that the user might want to ask next.
 
@@ -252,15 +278,35 @@ Generate exactly 4 follow-up questions in JSON format:
   {{"id": "3", "text": "Third follow-up question"}},
   {{"id": "4", "text": "Fourth follow-up question"}}
 ]
-"""
-    
-    prompt = PromptTemplate(
-        template=prompt_template,
-        input_variables=["history", "question", "answer", "language"]
+""",
+    input_variables=["history", "question", "answer", "language"]
+)
+
+@lru_cache(maxsize=1)
+def _default_llm() -> ChatAnthropic:
+    """The shared suggestion LLM, built once so requests reuse its HTTP connection pool."""
+    return ChatAnthropic(
+        model="claude-3-sonnet-20240229",
+        temperature=0.2,
+        max_tokens=4000
     )
+
+async def generate_contextual_questions(
+    question: str, 
+    answer: str, 
+    chat_history: List[Dict[str, str]], 
+    llm: Optional[ChatAnthropic] = None,
+    language: str = "en"
+) -> List[SuggestedQuestion]:
+    """Generate contextual follow-up questions using LLM."""
+    if llm is None:
+        llm = _default_llm()
+    
+    # Format chat history for the prompt
+    formatted_history = _render_history(chat_history)
     
     # Prepare the formatted prompt with language
-    formatted_prompt = prompt.format(
+    formatted_prompt = CONTEXTUAL_QUESTIONS_PROMPT.format(
         history=formatted_history,
         question=question,
         answer=answer,
@@ -294,31 +340,86 @@ Generate exactly 4 follow-up questions in JSON format:
         logger.error(f"Error generating contextual questions: {e}")
         return []
 
+# Share of a template question's word 3-grams that may already appear in the
+# contextual questions before it counts as a near-duplicate
+NEAR_DUPLICATE_OVERLAP = 0.7
+_WORD_RE = re.compile(r'\w+')
+
+def _word_trigrams(text: str) -> set:
+    """Lowercased word 3-grams of text (the whole word sequence if shorter)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def _drop_repeated_templates(contextual_questions: List[SuggestedQuestion],
+                             template_questions: List[SuggestedQuestion]) -> List[SuggestedQuestion]:
+    """Keeps template questions in order, skipping any whose word 3-grams mostly repeat a contextual question.
+
+    Contextual questions are never dropped, so they are not compared with each other.
+    """
+    contextual_trigrams = set()
+    for question in contextual_questions:
+        contextual_trigrams |= _word_trigrams(question.text)
+    unique_templates = []
+    for question in template_questions:
+        trigrams = _word_trigrams(question.text)
+        if len(trigrams & contextual_trigrams) > NEAR_DUPLICATE_OVERLAP * len(trigrams):
+            logger.debug(f"Dropping template suggestion that repeats a contextual one: {question.text}")
+            continue
+        unique_templates.append(question)
+    return unique_templates
+
+# Suggestion requests currently being generated, keyed by their inputs
+_in_flight_suggestions: Dict[Tuple, "asyncio.Future[List[SuggestedQuestion]]"] = {}
+
 async def generate_suggestions(
     question: str, 
     answer: str, 
     chat_history: List[Dict[str, str]]
 ) -> List[SuggestedQuestion]:
-    """Main function to generate suggested questions."""
+    """Main function to generate suggested questions.
+
+    Identical requests that arrive while one is already being generated (e.g. the
+    same canned answer shown in several sessions) share that LLM call instead of
+    each making their own.
+    """
+    key = (question, answer, tuple((msg.get("role"), msg.get("content")) for msg in chat_history))
+    task = _in_flight_suggestions.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_generate_suggestions(question, answer, chat_history))
+        _in_flight_suggestions[key] = task
+        task.add_done_callback(lambda _: _in_flight_suggestions.pop(key, None))
+    # shield: one caller disconnecting must not cancel the generation the others await
+    return list(await asyncio.shield(task))
+
+async def _generate_suggestions(
+    question: str, 
+    answer: str, 
+    chat_history: List[Dict[str, str]]
+) -> List[SuggestedQuestion]:
+    """Generates suggested questions from templates and the LLM."""
     # Detect language
     language = detect_language(question if question else answer)
     
     # Extract entities from the conversation
     entities = extract_entities(question + " " + answer)
     
-    # Generate questions using templates
-    template_questions = generate_template_questions(question, answer, entities, language)
-    
-    # Generate contextual questions using LLM with language parameter
-    contextual_questions = await generate_contextual_questions(
-        question, 
-        answer, 
-        chat_history,
-        language=language
+    # Generate template questions (sync, on a worker thread) while the LLM
+    # generates contextual questions, so the template work overlaps the LLM round trip
+    template_questions, contextual_questions = await asyncio.gather(
+        asyncio.to_thread(generate_template_questions, question, answer, entities, language),
+        generate_contextual_questions(
+            question, 
+            answer, 
+            chat_history,
+            language=language
+        )
     )
     
-    # Combine questions (prioritizing contextual ones)
-    all_questions = contextual_questions + template_questions
+    # Combine questions (prioritizing contextual ones), dropping template questions
+    # that repeat a contextual one
+    all_questions = contextual_questions + _drop_repeated_templates(contextual_questions, template_questions)
     
     # Limit to exactly 4 questions
     return all_questions[:4] 
\ No newline at end of file
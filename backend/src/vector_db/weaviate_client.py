@@ -1,6 +1,11 @@
 import weaviate
 import weaviate.classes as wvc
 import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress
 from typing import List, Optional, Dict, Any
 from urllib.parse import urlparse
 from weaviate.exceptions import (
@@ -21,9 +26,67 @@ logger = logging.getLogger(__name__)
 # Removed old basicConfig call
 
 # --- Configuration (Constants within this module) ---
-CLASS_NAME = "YojnaChunk" # Name for the Weaviate collection
+CLASS_NAME = "YojnaChunk"
+
+# HNSW / product quantization settings for the chunk collection
+HNSW_EF = 64
+HNSW_EF_CONSTRUCTION = 128
+PQ_SEGMENT_DIMS = 8 # Vector dimensions per PQ segment (768-dim vectors -> 96 segments)
+
+# Namespace for deterministic chunk object UUIDs (uuid5 of document hash + chunk id),
+# so re-importing the same document overwrites its objects instead of duplicating them
+CHUNK_UUID_NAMESPACE = uuid.UUID("6f0c1f2e-5b7a-4c8e-9d3a-2e4b8a1c7d90")
+
+# Objects per insert_many request and how many requests may be in flight at once.
+# One request for a whole large document can hit Weaviate's request timeout
+IMPORT_BATCH_SIZE = 100
+IMPORT_MAX_CONCURRENT = 4
+
+# --- Shared Client --- #
+# get_weaviate_client hands out one connected client instead of opening a new
+# HTTP/gRPC connection per call. Within the TTL it is reused as long as it is
+# still connected; after that it must pass a readiness check before being reused.
+CLIENT_HEALTH_CHECK_TTL_SECONDS = 30
+_cached_client: Optional[weaviate.WeaviateClient] = None
+_cached_at = 0.0
+_client_lock = threading.Lock()
 
 def get_weaviate_client() -> weaviate.WeaviateClient: # Return type is non-optional now, relies on exception
+    """Returns the shared WeaviateClient, connecting (or reconnecting) when needed.
+
+    The client is shared across callers, so release it with close_weaviate_client()
+    rather than closing it directly.
+
+    Returns:
+        An initialized and connected WeaviateClient instance.
+
+    Raises:
+        WeaviateConnectionError: If connection fails.
+    """
+    global _cached_client, _cached_at
+    with _client_lock:
+        if _cached_client is not None and _cached_client.is_connected():
+            if time.monotonic() - _cached_at < CLIENT_HEALTH_CHECK_TTL_SECONDS:
+                return _cached_client
+            if _cached_client.is_ready():
+                _cached_at = time.monotonic()
+                return _cached_client
+            logger.warning("Cached Weaviate client is no longer ready; reconnecting.")
+            _cached_client.close()
+        _cached_client = None
+        _cached_client = _connect_weaviate_client()
+        _cached_at = time.monotonic()
+        return _cached_client
+
+def close_weaviate_client():
+    """Closes the shared client (if any); the next get_weaviate_client() reconnects."""
+    global _cached_client
+    with _client_lock:
+        if _cached_client is not None:
+            _cached_client.close()
+            _cached_client = None
+
+def _connect_weaviate_client() -> weaviate.WeaviateClient:
     """Establishes a connection to the Weaviate instance using v4 client.
 
     Returns:
@@ -80,6 +143,14 @@ def get_weaviate_client() -> weaviate.WeaviateClient: # Return type is non-optio
         if client: client.close()
         raise WeaviateConnectionError(f"Unexpected error connecting to Weaviate at {weaviate_url}: {e}") from e
 
+def _pq_segments(dimension: int) -> int:
+    """Number of PQ segments for vectors of the given size; segments must divide it."""
+    if dimension % PQ_SEGMENT_DIMS:
+        raise WeaviateSchemaError(
+            f"EMBEDDING_DIMENSION ({dimension}) must be a multiple of {PQ_SEGMENT_DIMS} to split vectors into PQ segments."
+        )
+    return dimension // PQ_SEGMENT_DIMS
+
 def ensure_schema_exists(client: weaviate.WeaviateClient):
     """Ensures the YojnaChunk collection schema exists and has the necessary properties.
 
@@ -95,15 +166,16 @@ def ensure_schema_exists(client: weaviate.WeaviateClient):
     """
     should_create_collection = False
     document_hash_property_name = "document_hash"
+    pq_segments = _pq_segments(config.EMBEDDING_DIMENSION)
 
     try:
         if client.collections.exists(CLASS_NAME):
             logger.info(f"Weaviate collection '{CLASS_NAME}' already exists. Verifying properties...")
             collection = client.collections.get(CLASS_NAME)
-            config = collection.config.get()
+            collection_config = collection.config.get()
 
             # Check if document_hash property exists
-            prop_exists = any(prop.name == document_hash_property_name for prop in config.properties)
+            prop_exists = any(prop.name == document_hash_property_name for prop in collection_config.properties)
 
             if not prop_exists:
                 logger.warning(f"Property '{document_hash_property_name}' missing in existing collection '{CLASS_NAME}'. Deleting and recreating collection to ensure correct schema.")
@@ -140,10 +212,14 @@ def ensure_schema_exists(client: weaviate.WeaviateClient):
             ]
 
             # Define vector index config using wvc constants
+            # ef caps the candidate list explored per query; PQ compresses the vectors
+            # (segments of PQ_SEGMENT_DIMS dims) so each probe reads far less memory.
             vector_index_config = wvc.config.Configure.VectorIndex.hnsw(
                 distance_metric=wvc.config.VectorDistances.COSINE, # v4 uses constants here now
-                ef_construction=128,
-                max_connections=16
+                ef=HNSW_EF,
+                ef_construction=HNSW_EF_CONSTRUCTION,
+                max_connections=16,
+                quantizer=wvc.config.Configure.VectorIndex.Quantizer.pq(segments=pq_segments)
             )
 
             client.collections.create(
@@ -168,7 +244,22 @@ def ensure_schema_exists(client: weaviate.WeaviateClient):
         logger.error(f"Unexpected error occurred during schema check/creation for collection '{CLASS_NAME}': {e}", exc_info=True)
         raise WeaviateSchemaError(f"Failed to ensure Weaviate schema '{CLASS_NAME}': {e}") from e
 
-def batch_import_chunks(client: weaviate.WeaviateClient, chunks: List[DocumentChunk], document_hash: str):
+def _chunk_to_data_object(chunk: DocumentChunk, document_hash: str) -> wvc.data.DataObject:
+    """Builds the Weaviate data object for an embedded chunk."""
+    properties = {
+        "chunk_id": chunk.chunk_id,
+        "document_id": chunk.document_id,
+        "document_hash": document_hash, # Ensure hash is included
+        "text": chunk.text,
+        "page_number": chunk.metadata.get("page_number")
+    }
+    # Filter out None values if necessary, although Weaviate might handle them
+    properties = {k: v for k, v in properties.items() if v is not None}
+    object_uuid = uuid.uuid5(CHUNK_UUID_NAMESPACE, f"{document_hash}:{chunk.chunk_id}")
+    return wvc.data.DataObject(properties=properties, vector=chunk.embedding, uuid=object_uuid)
+
+def batch_import_chunks(client: weaviate.WeaviateClient, chunks: List[DocumentChunk], document_hash: str,
+                        batch_size: int = IMPORT_BATCH_SIZE, max_concurrent: int = IMPORT_MAX_CONCURRENT):
     """Imports a list of DocumentChunk objects into Weaviate using v4 batching,
     associating them with the original document's hash.
 
@@ -176,6 +267,8 @@ def batch_import_chunks(client: weaviate.WeaviateClient, chunks: List[DocumentCh
         client: An initialized WeaviateClient.
         chunks: A list of DocumentChunk objects (must have embeddings).
         document_hash: The SHA256 hash of the original document.
+        batch_size: Maximum number of objects sent per insert_many request.
+        max_concurrent: Maximum number of insert_many requests in flight at once.
 
     Raises:
         WeaviateConnectionError: If the client is not connected.
@@ -190,30 +283,26 @@ def batch_import_chunks(client: weaviate.WeaviateClient, chunks: List[DocumentCh
         raise WeaviateConnectionError("Client is not connected for batch import.")
 
     logger.info(f"Starting batch import of {len(chunks)} chunks into Weaviate collection '{CLASS_NAME}'...")
-    skipped_count = 0
-    objects_to_insert = []
-
-    # Prepare data objects first
-    for chunk in chunks:
-        if chunk.embedding is None:
-            logger.warning(f"Skipping chunk {chunk.chunk_id} due to missing embedding.")
-            skipped_count += 1
-            continue
-
-        properties = {
-            "chunk_id": chunk.chunk_id,
-            "document_id": chunk.document_id,
-            "document_hash": document_hash, # Ensure hash is included
-            "text": chunk.text,
-            "page_number": chunk.metadata.get("page_number")
-        }
-        # Filter out None values if necessary, although Weaviate might handle them
-        properties = {k: v for k, v in properties.items() if v is not None}
-
-        objects_to_insert.append(wvc.data.DataObject(
-            properties=properties,
-            vector=chunk.embedding
-        ))
+    # Check each chunk for an embedding once; the mask drives both the selection
+    # (itertools.compress iterates in C) and the report of skipped chunks
+    has_embedding = [chunk.embedding is not None for chunk in chunks]
+    embedded_chunks = list(compress(chunks, has_embedding))
+    skipped_count = len(chunks) - len(embedded_chunks)
+    if skipped_count:
+        skipped_ids = [chunk.chunk_id for chunk, embedded in zip(chunks, has_embedding) if not embedded]
+        logger.warning(f"Skipping {skipped_count} chunks due to missing embeddings: {skipped_ids}")
+
+    # Reject wrong-sized vectors here instead of after a round trip to Weaviate
+    dimension = config.EMBEDDING_DIMENSION
+    malformed_ids = [chunk.chunk_id for chunk in embedded_chunks if len(chunk.embedding) != dimension]
+    if malformed_ids:
+        logger.error(f"{len(malformed_ids)} chunks have embeddings that are not {dimension}-dimensional: {malformed_ids}")
+        raise WeaviateStorageError(
+            f"{len(malformed_ids)} chunks have embeddings of the wrong dimension (expected {dimension}).",
+            failed_objects=malformed_ids
+        )
+
+    objects_to_insert = [_chunk_to_data_object(chunk, document_hash) for chunk in embedded_chunks]
 
     if not objects_to_insert:
         logger.warning("No valid chunks with embeddings found to import after filtering.")
@@ -221,17 +310,30 @@ def batch_import_chunks(client: weaviate.WeaviateClient, chunks: List[DocumentCh
 
     try:
         collection = client.collections.get(CLASS_NAME)
-        logger.debug(f"Attempting to insert {len(objects_to_insert)} objects into '{CLASS_NAME}'...")
+        batch_starts = range(0, len(objects_to_insert), batch_size)
+        batches = [objects_to_insert[start:start + batch_size] for start in batch_starts]
+        logger.debug(f"Attempting to insert {len(objects_to_insert)} objects into '{CLASS_NAME}' in {len(batches)} batches...")
 
         # Using insert_many for potentially better efficiency and error reporting
-        response = collection.data.insert_many(objects_to_insert)
-
-        # Check for errors in the response object for item-specific failures
-        if response.has_errors:
-            error_count = len(response.errors)
+        if len(batches) == 1:
+            responses = [collection.data.insert_many(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_concurrent, len(batches))) as executor:
+                responses = list(executor.map(collection.data.insert_many, batches))
+
+        # Collect item-specific failures, re-keyed from each batch's own indices
+        # to the object's position in the whole import
+        errors = {
+            start + index: error
+            for start, response in zip(batch_starts, responses)
+            if response.has_errors
+            for index, error in response.errors.items()
+        }
+        if errors:
+            error_count = len(errors)
             logger.error(f"Encountered {error_count} errors during batch import (reported by Weaviate response object).")
             # Log details of the first few errors for debugging
-            for i, error_obj in enumerate(response.errors.items()):
+            for i, error_obj in enumerate(errors.items()):
                  if i < 5: # Log first 5 errors
                      logger.error(f" Error {i+1}: Index {error_obj[0]} - {error_obj[1].message}")
                  else:
@@ -241,13 +343,15 @@ def batch_import_chunks(client: weaviate.WeaviateClient, chunks: List[DocumentCh
             # Use the custom WeaviateStorageError
             raise WeaviateStorageError(
                 f"{error_count} errors occurred during batch import into '{CLASS_NAME}'. Check logs for details.",
-                failed_objects=response.errors # Pass the error details
+                failed_objects=errors # Pass the error details
             )
         else:
              # Note: insert_many response doesn't directly give success count, assume all non-error objects succeeded
              success_count = len(objects_to_insert)
              logger.info(f"Successfully processed batch import request for {success_count} objects into Weaviate collection '{CLASS_NAME}'. Skipped: {skipped_count}")
 
+    except WeaviateStorageError:
+        raise # Already summarised above; don't re-wrap as an unexpected error
     # Catch errors related to the API call itself (connection, query structure)
     except (WeaviateQueryError, WeaviateV4ConnectionError) as e:
         logger.error(f"A Weaviate API call error occurred during the batch import process: {e}", exc_info=True)
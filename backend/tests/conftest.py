@@ -30,6 +30,19 @@ def setup_environment():
     # Could mock out config module here if needed
     pass 
 
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the whole session instead of one per test module.
+
+    The client is deliberately not entered as a context manager: the startup
+    event connects to Weaviate and exits on failure, and the endpoint tests
+    patch what they need per request. Tests that want the startup path
+    (test_ci_debug.test_fastapi_client) open their own `with TestClient(app)`.
+    """
+    from fastapi.testclient import TestClient
+    from backend.src.main import app
+    return TestClient(app)
+
 @pytest.fixture(autouse=True)
 def mock_weaviate_for_ci(monkeypatch):
     """
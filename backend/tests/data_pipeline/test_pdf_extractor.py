@@ -0,0 +1,217 @@
+import threading
+import pytest
+from pathlib import Path
+from typing import List, Optional
+from unittest.mock import MagicMock
+
+from backend.src.data_pipeline import pdf_extractor
+from backend.src.data_pipeline.pdf_extractor import extract_text_from_pdf
+
+_real_fast_extract_page_texts = pdf_extractor._fast_extract_page_texts
+
+# --- Lightweight fakes --- #
+# The page/PDF objects are plain classes rather than MagicMock chains: attribute
+# access is a slot lookup instead of a __getattr__ round trip, and typos fail
+# loudly. Only the module-level entry points (pdfplumber.open, OCR) are mocked.
+
+class FakeImage:
+    __slots__ = ('original',)
+
+    def __init__(self, original):
+        self.original = original
+
+
+class FakePage:
+    """Stand-in for a pdfplumber page."""
+    __slots__ = ('page_number', '_text', '_error')
+
+    def __init__(self, page_number: int, text: Optional[str] = "", error: Optional[Exception] = None):
+        self.page_number = page_number
+        self._text = text
+        self._error = error
+
+    def extract_text(self):
+        if self._error is not None:
+            raise self._error
+        return self._text
+
+    def to_image(self, resolution=None):
+        return FakeImage(original=f"image-of-page-{self.page_number}")
+
+
+class FakePdf:
+    """Stand-in for the object returned by pdfplumber.open()."""
+    __slots__ = ('pages',)
+
+    def __init__(self, pages: List[FakePage]):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+LONG_TEXT = "This page has plenty of directly extractable text on it."
+
+# --- Fixtures --- #
+
+@pytest.fixture
+def pdf_path(tmp_path) -> Path:
+    """A real file on disk so the is_file() guard passes."""
+    path = tmp_path / "scheme.pdf"
+    path.write_bytes(b"%PDF-1.4 fake")
+    return path
+
+@pytest.fixture
+def mock_pdf_page() -> FakePage:
+    return FakePage(page_number=1, text=LONG_TEXT)
+
+@pytest.fixture
+def mock_pdf_file(mock_pdf_page) -> FakePdf:
+    return FakePdf(pages=[mock_pdf_page])
+
+@pytest.fixture(autouse=True)
+def mock_fast_path(monkeypatch):
+    """Disables the pdfminer fast path by default so tests exercise pdfplumber."""
+    fast_path = MagicMock(return_value=None)
+    monkeypatch.setattr(pdf_extractor, "_fast_extract_page_texts", fast_path)
+    return fast_path
+
+@pytest.fixture
+def mock_pdfplumber_open(monkeypatch, mock_pdf_file):
+    opener = MagicMock(return_value=mock_pdf_file)
+    monkeypatch.setattr(pdf_extractor.pdfplumber, "open", opener)
+    return opener
+
+@pytest.fixture
+def mock_ocr(monkeypatch):
+    ocr = MagicMock(return_value="")
+    monkeypatch.setattr(pdf_extractor.pytesseract, "image_to_string", ocr)
+    return ocr
+
+# --- Tests --- #
+
+def test_extract_text_file_not_found(tmp_path):
+    assert extract_text_from_pdf(tmp_path / "missing.pdf") is None
+
+def test_extract_text_direct(pdf_path, mock_pdfplumber_open, mock_ocr):
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(1, LONG_TEXT)]
+    mock_pdfplumber_open.assert_called_once_with(pdf_path)
+    mock_ocr.assert_not_called()
+
+def test_extract_text_cleans_whitespace(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    mock_pdf_file.pages = [FakePage(1, text="  Spread   out\n\ntext   with enough   length  ")]
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(1, "Spread out text with enough length")]
+
+def test_extract_text_ocr_fallback(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    mock_pdf_file.pages = [FakePage(1, text="tiny")]
+    mock_ocr.return_value = "  OCR   recovered text "
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(1, "OCR recovered text")]
+    mock_ocr.assert_called_once_with("image-of-page-1", lang='eng+hin')
+
+def test_extract_text_ocr_failure_keeps_direct_text(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    mock_pdf_file.pages = [FakePage(1, text="tiny")]
+    mock_ocr.side_effect = RuntimeError("tesseract not installed")
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(1, "tiny")]
+
+def test_extract_text_empty_page_skipped(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    mock_pdf_file.pages = [FakePage(1, text=None), FakePage(2, text=LONG_TEXT)]
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(2, LONG_TEXT)]
+    assert mock_ocr.call_count == 1
+
+def test_extract_text_page_error_continues(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    mock_pdf_file.pages = [
+        FakePage(1, error=ValueError("corrupt page")),
+        FakePage(2, text=LONG_TEXT),
+    ]
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(2, LONG_TEXT)]
+
+def test_extract_text_multiple_pages(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    mock_pdf_file.pages = [FakePage(i, text=f"{LONG_TEXT} Page {i}.") for i in range(1, 4)]
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert [page_num for page_num, _ in result] == [1, 2, 3]
+    assert result[2][1].endswith("Page 3.")
+
+def test_extract_text_open_error(pdf_path, mock_pdfplumber_open):
+    mock_pdfplumber_open.side_effect = Exception("not a PDF")
+
+    assert extract_text_from_pdf(pdf_path) is None
+
+def test_extract_text_fast_path_no_pdfplumber(pdf_path, mock_fast_path, mock_pdfplumber_open, mock_ocr):
+    mock_fast_path.return_value = [LONG_TEXT, f"{LONG_TEXT} Second page."]
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(1, LONG_TEXT), (2, f"{LONG_TEXT} Second page.")]
+    mock_pdfplumber_open.assert_not_called()
+    mock_ocr.assert_not_called()
+
+def test_extract_text_fast_path_ocr_only_sparse_pages(pdf_path, mock_fast_path, mock_pdfplumber_open,
+                                                      mock_pdf_file, mock_ocr):
+    mock_fast_path.return_value = [LONG_TEXT, ""]
+    mock_pdf_file.pages = [FakePage(1, error=AssertionError("page 1 should not be re-parsed")), FakePage(2, text="")]
+    mock_ocr.return_value = "Scanned page text"
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert result == [(1, LONG_TEXT), (2, "Scanned page text")]
+    mock_ocr.assert_called_once_with("image-of-page-2", lang='eng+hin')
+
+def test_fast_extract_page_texts_invalid_pdf(pdf_path):
+    # The autouse fixture replaces the module attribute, so call the original
+    assert _real_fast_extract_page_texts(pdf_path) is None
+
+class ObservedPage(FakePage):
+    """A scanned page that signals when pdfplumber starts parsing it."""
+    __slots__ = ('parse_started',)
+
+    def __init__(self, page_number: int):
+        super().__init__(page_number, text="")
+        self.parse_started = threading.Event()
+
+    def extract_text(self):
+        self.parse_started.set()
+        return ""
+
+# Only reached if page N+1 is never parsed while page N is in OCR
+OVERLAP_WAIT_SECONDS = 5
+
+def test_prefetch_pipelines_ocr_and_parse(pdf_path, mock_pdfplumber_open, mock_pdf_file, mock_ocr):
+    pages = [ObservedPage(i) for i in range(1, 5)]
+    mock_pdf_file.pages = pages
+    overlapped = {}
+
+    def ocr_waiting_for_next_parse(image, lang):
+        page_num = int(image.rsplit("-", 1)[1])
+        if page_num < len(pages):
+            # OCR of page N only finishes once parsing of page N+1 has begun
+            overlapped[page_num] = pages[page_num].parse_started.wait(OVERLAP_WAIT_SECONDS)
+        return f"OCR text for {image}"
+    mock_ocr.side_effect = ocr_waiting_for_next_parse
+
+    result = extract_text_from_pdf(pdf_path)
+
+    assert [page_num for page_num, _ in result] == [1, 2, 3, 4]
+    assert result[3][1] == "OCR text for image-of-page-4"
+    assert overlapped == {1: True, 2: True, 3: True}
@@ -0,0 +1,152 @@
+"""Shared fixtures for the integration test suite."""
+
+import functools
+import os
+
+import pytest
+import pytest_asyncio
+from unittest.mock import create_autospec
+
+# --- Live dependency probes --- #
+# Cached so Weaviate is contacted at most once per session.
+@functools.lru_cache(maxsize=1)
+def is_weaviate_available():
+    """Check if Weaviate is available at the URL from environment variables."""
+    try:
+        import weaviate
+        # Assume v4 and try connect_to_local first
+        client = weaviate.connect_to_local()
+        is_ready = client.is_ready()
+        client.close() # Close the connection after check
+        return is_ready
+    except ImportError:
+         # Handle case where weaviate-client might not be installed
+         return False
+    except Exception as e:
+        # Catch potential connection errors or other issues
+        print(f"Error checking Weaviate availability: {e}")
+        # Attempt to close client if it was partially initialized
+        try:
+            if 'client' in locals() and hasattr(client, 'close'):
+                client.close()
+        except Exception as close_e:
+            print(f"  Error closing client during exception handling: {close_e}")
+        return False
+
+@functools.lru_cache(maxsize=1)
+def is_anthropic_key_available():
+    """Check if the Anthropic API key is available in environment variables."""
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    return api_key is not None and api_key != "" and api_key != "YOUR_ANTHROPIC_API_KEY_HERE"
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skips `live` tests in one pass when Weaviate or the Anthropic key is unavailable."""
+    live_items = [item for item in items if item.get_closest_marker("live") is not None]
+    if not live_items:
+        return # Don't probe at all if nothing needs the live services
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    missing = []
+    if not is_weaviate_available():
+        missing.append("Weaviate is not available")
+    if not is_anthropic_key_available():
+        missing.append("Anthropic API key is not properly configured")
+    if missing:
+        skip_live = pytest.mark.skip(reason=f"{' and '.join(missing)} - live integration test skipped")
+        for item in live_items:
+            item.add_marker(skip_live)
+
+
+# The app, httpx and LangChain are imported inside the fixtures that need them, so
+# collecting a subset of tests (or importing this module for its helpers) does not
+# pull in the whole application dependency tree.
+
+
+@pytest.fixture(scope="session")
+def asgi_transport():
+    """One in-process ASGI transport for the app, shared by every integration module.
+
+    The transport does not run the app's startup event, so tests never need a
+    live Weaviate connection. It holds no sockets, so nothing has to be closed.
+    """
+    from httpx import ASGITransport
+    from backend.src.main import app
+    return ASGITransport(app=app)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def async_client(asgi_transport):
+    """A single async HTTP client over the shared transport, closed at session end.
+
+    Tests await its requests, so several calls can be in flight concurrently.
+    Named apart from the session TestClient `client` in tests/conftest.py.
+    """
+    from httpx import AsyncClient
+    async with AsyncClient(transport=asgi_transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def _autospec_chain_template():
+    """An autospec'd RAG chain, built once per session.
+
+    create_autospec introspects the whole Runnable API, so pay for it once.
+    Building a real chain via create_conversational_rag_chain() would need an
+    Anthropic key, so the spec is taken from the RunnableSequence it returns.
+    """
+    from langchain_core.runnables import RunnableSequence
+    return create_autospec(RunnableSequence, instance=True, spec_set=True)
+
+
+@pytest.fixture
+def autospec_chain(_autospec_chain_template):
+    """The session chain mock, reset for this test.
+
+    copy.copy() of a mock shares its child mocks (e.g. `ainvoke`) with the
+    original, so a copy would not isolate tests; resetting the template does.
+    """
+    _autospec_chain_template.reset_mock(return_value=True, side_effect=True)
+    return _autospec_chain_template
+
+
+@pytest.fixture(scope="session")
+def rag_chain():
+    """One live conversational RAG chain for the whole session.
+
+    Building it sets up the retriever (Weaviate client + embedding model), the LLM
+    and the prompt graph; the tests only invoke it, so sharing it is safe.
+    """
+    from backend.src.rag.chain import create_conversational_rag_chain
+    return create_conversational_rag_chain()
+
+
+# --- Canned Anthropic API responses --- #
+
+ANTHROPIC_MESSAGES_URL = "https://api.anthropic.com/v1/messages"
+CANNED_ANTHROPIC_TEXT = (
+    "Retrieval-Augmented Generation (RAG) combines a retriever, which looks up relevant "
+    "documents for a question, with a language model that answers using those documents as context."
+)
+
+
+@pytest.fixture
+def mocked_anthropic(respx_mock, monkeypatch):
+    """Intercepts Anthropic Messages API calls at the HTTP layer with a canned reply.
+
+    The real ChatAnthropic / LangChain code path runs; only the network is replaced.
+    Returns the respx route so tests can inspect the outgoing requests.
+    """
+    import httpx
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-anthropic-key")
+    return respx_mock.post(ANTHROPIC_MESSAGES_URL).mock(return_value=httpx.Response(200, json={
+        "id": "msg_test",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-haiku-20240307",
+        "content": [{"type": "text", "text": CANNED_ANTHROPIC_TEXT}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 12, "output_tokens": 40},
+    }))
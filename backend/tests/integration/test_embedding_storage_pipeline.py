@@ -4,6 +4,7 @@ import numpy as np
 from backend.src.schemas import DocumentChunk
 from backend.src.data_pipeline import embedding_generator
 from backend.src.vector_db import weaviate_client
+from backend.src import config
 from backend.src.exceptions import EmbeddingGenerationError, WeaviateStorageError
 
 @pytest.fixture
@@ -38,12 +39,8 @@ def test_embedding_and_storage_pipeline(sample_document_chunks):
     """
     # Mock the embedding model
     with patch.object(embedding_generator, 'model') as mock_model:
-        # Set up mock embeddings - 3 samples with 4-dimensional vectors
-        mock_embeddings = np.array([
-            [0.1, 0.2, 0.3, 0.4],
-            [0.5, 0.6, 0.7, 0.8],
-            [0.9, 0.8, 0.7, 0.6]
-        ])
+        # Set up mock embeddings - 3 samples with the dimension batch_import_chunks expects
+        mock_embeddings = np.full((3, config.EMBEDDING_DIMENSION), [[0.1], [0.5], [0.9]])
         mock_model.encode.return_value = mock_embeddings
         
         # Mock the Weaviate client
@@ -69,7 +66,7 @@ def test_embedding_and_storage_pipeline(sample_document_chunks):
             # Verify embeddings were added
             assert len(chunks_with_embeddings) == 3
             assert all(chunk.embedding is not None for chunk in chunks_with_embeddings)
-            assert len(chunks_with_embeddings[0].embedding) == 4
+            assert len(chunks_with_embeddings[0].embedding) == config.EMBEDDING_DIMENSION
             
             # Step 2: Ensure schema exists
             weaviate_client.ensure_schema_exists(mock_client)
@@ -107,11 +104,7 @@ def test_pipeline_with_storage_error(sample_document_chunks):
     """Test pipeline error handling when storage fails."""
     # Mock embedding generation to succeed
     with patch.object(embedding_generator, 'model') as mock_model:
-        mock_embeddings = np.array([
-            [0.1, 0.2, 0.3, 0.4],
-            [0.5, 0.6, 0.7, 0.8],
-            [0.9, 0.8, 0.7, 0.6]
-        ])
+        mock_embeddings = np.full((3, config.EMBEDDING_DIMENSION), [[0.1], [0.5], [0.9]])
         mock_model.encode.return_value = mock_embeddings
         
         # Generate embeddings
@@ -1,125 +1,114 @@
 """Integration tests for the /chat API endpoint in main.py."""
 
-import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
+import functools
+from typing import TYPE_CHECKING, Tuple
+from unittest.mock import Mock
 
-# Import the FastAPI app instance and specific message types for assertions
-from backend.src.main import app
-from backend.src.exceptions import WeaviateConnectionError
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from typing import List, Tuple
-
-# Mark all tests in this module as integration tests
-pytestmark = pytest.mark.integration
-
-@pytest.fixture(scope="module")
-def client():
-    """Pytest fixture to create a FastAPI TestClient."""
-    with TestClient(app) as c:
-        yield c
-
-# Patch the NEW chain creation function
-@patch('backend.src.main.create_conversational_rag_chain')
-def test_chat_endpoint_success_no_history(mock_create_chain, client):
-    """Test successful response with no initial history."""
-    # Arrange
-    mock_chain = AsyncMock()
-    mock_chain.ainvoke.return_value = "This is the initial answer."
-    mock_create_chain.return_value = mock_chain
-
-    # Note: chat_history defaults to [] if not provided
-    query_data = {"question": "First question?"}
-    expected_input_to_chain = {
-        "input": query_data["question"],
-        "chat_history": [] # Expect empty list of BaseMessages
-    }
-    expected_updated_history = [[query_data["question"], "This is the initial answer."]]
-
-    # Act
-    response = client.post("/chat", json=query_data)
+import pytest
 
-    # Assert
-    assert response.status_code == 200
-    response_json = response.json()
-    assert response_json["answer"] == "This is the initial answer."
-    assert response_json["updated_history"] == expected_updated_history
-    mock_create_chain.assert_called_once()
-    # Check that ainvoke was called with correctly formatted history (empty list)
-    mock_chain.ainvoke.assert_called_once_with(expected_input_to_chain)
+from backend.src.exceptions import WeaviateConnectionError
 
-@patch('backend.src.main.create_conversational_rag_chain')
-def test_chat_endpoint_success_with_history(mock_create_chain, client):
-    """Test successful response with existing conversation history."""
+# The shared `async_client` fixture lives in conftest.py. LangChain message types
+# are imported where the expected chain input is built, keeping collection light.
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+# Mark all tests in this module as (async) integration tests
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+@functools.lru_cache(maxsize=64)
+def _as_messages(history: Tuple[Tuple[str, str], ...]) -> Tuple["BaseMessage", ...]:
+    """The LangChain messages /chat should build from `history`, cached per history."""
+    from langchain_core.messages import HumanMessage, AIMessage
+    messages = []
+    for human_msg, ai_msg in history:
+        messages.extend([HumanMessage(content=human_msg), AIMessage(content=ai_msg)])
+    return tuple(messages)
+
+@pytest.fixture(autouse=True)
+def mock_create_chain(monkeypatch, autospec_chain):
+    """Replaces the chain factory used by /chat with a mock returning `mock_chain`.
+
+    monkeypatch restores the attribute directly on teardown, avoiding the
+    patcher start/stop cost of a @patch decorator on every test. The chain is
+    autospec'd, so a misspelled chain method fails the test instead of passing.
+    """
+    create_chain = Mock(return_value=autospec_chain)
+    monkeypatch.setattr("backend.src.main.create_conversational_rag_chain", create_chain)
+    return create_chain
+
+@pytest.fixture
+def mock_chain(mock_create_chain):
+    """The mock chain returned by the patched factory; configure `ainvoke` per test."""
+    return mock_create_chain.return_value
+
+ENGLISH_FALLBACK_ANSWER = "I'm sorry, I couldn't find an answer to this question."
+INTERNAL_ERROR_DETAIL = "Internal server error while processing the chat query."
+
+# (question, chat_history, ainvoke result or exception, expected status, expected answer/detail, expected history)
+# An expected history of None means "the incoming history plus this turn".
+CHAT_CASES = [
+    pytest.param("First question?", [], "This is the initial answer.",
+                 200, "This is the initial answer.", None, id="success_no_history"),
+    pytest.param("Follow-up question?", [("Question 1", "Answer 1")], "This is the follow-up answer.",
+                 200, "This is the follow-up answer.", None, id="success_with_history"),
+    pytest.param("Test question?", [],
+                 {"answer": "This is a mock AI answer.", "chat_history": [["Test question?", "This is a mock AI answer."]]},
+                 200, "This is a mock AI answer.", [["Test question?", "This is a mock AI answer."]],
+                 id="success_dict_response"),
+    # Empty answer: English fallback message, history returned unchanged
+    pytest.param("An obscure question?", [("Q1", "A1")], "",
+                 200, ENGLISH_FALLBACK_ANSWER, [["Q1", "A1"]], id="empty_answer_with_history"),
+    pytest.param("Another question", [("PrevQ", "PrevA")], Exception("Something totally unexpected happened"),
+                 500, INTERNAL_ERROR_DETAIL, None, id="unexpected_error"),
+]
+
+@pytest.mark.parametrize(
+    "question, chat_history, chain_result, expected_status, expected_text, expected_history", CHAT_CASES
+)
+async def test_chat_endpoint(mock_create_chain, mock_chain, async_client, question, chat_history, chain_result,
+                             expected_status, expected_text, expected_history):
+    """/chat formats history for the chain and maps its result (or failure) to the response."""
     # Arrange
-    mock_chain = AsyncMock()
-    mock_chain.ainvoke.return_value = "This is the follow-up answer."
-    mock_create_chain.return_value = mock_chain
-
-    initial_history: List[Tuple[str, str]] = [("Question 1", "Answer 1")]
-    query_data = {
-        "question": "Follow-up question?",
-        "chat_history": initial_history
-    }
-
-    # Construct the expected BaseMessage list passed to the chain
-    expected_formatted_history: List[BaseMessage] = [
-        HumanMessage(content="Question 1"),
-        AIMessage(content="Answer 1")
-    ]
-    expected_input_to_chain = {
-        "input": query_data["question"],
-        "chat_history": expected_formatted_history
-    }
-    expected_updated_history = [[h[0], h[1]] for h in initial_history] + [[query_data["question"], "This is the follow-up answer."]]
+    if isinstance(chain_result, Exception):
+        mock_chain.ainvoke.side_effect = chain_result
+    else:
+        mock_chain.ainvoke.return_value = chain_result
+
+    query_data = {"question": question, "chat_history": chat_history}
+    # The endpoint passes the history to the chain as a list of BaseMessages
+    expected_formatted_history = list(_as_messages(tuple(map(tuple, chat_history))))
+    expected_input_to_chain = {"input": question, "chat_history": expected_formatted_history}
 
     # Act
-    response = client.post("/chat", json=query_data)
+    response = await async_client.post("/chat", json=query_data)
 
     # Assert
-    assert response.status_code == 200
+    assert response.status_code == expected_status
     response_json = response.json()
-    assert response_json["answer"] == "This is the follow-up answer."
-    assert response_json["updated_history"] == expected_updated_history
+    if expected_status == 200:
+        assert response_json["answer"] == expected_text
+        if expected_history is None:
+            expected_history = [list(turn) for turn in chat_history] + [[question, expected_text]]
+        assert response_json["updated_history"] == expected_history
+    else:
+        assert response_json["detail"] == expected_text
     mock_create_chain.assert_called_once()
-    # Check that ainvoke was called with correctly formatted history
-    mock_chain.ainvoke.assert_called_once_with(expected_input_to_chain)
-
-
-@patch('backend.src.main.create_conversational_rag_chain')
-def test_chat_endpoint_empty_answer_with_history(mock_create_chain, client):
-    """Test response when the RAG chain returns an empty answer with history."""
-    # Arrange
-    mock_chain = AsyncMock()
-    mock_chain.ainvoke.return_value = "" # Simulate empty answer
-    mock_create_chain.return_value = mock_chain
+    mock_chain.ainvoke.assert_awaited_once_with(expected_input_to_chain)
 
-    initial_history: List[Tuple[str, str]] = [("Q1", "A1")]
-    query_data = {"question": "An obscure question?", "chat_history": initial_history}
+async def test_chat_endpoint_concurrent_requests(mock_create_chain, mock_chain, async_client):
+    """Several chat requests can be in flight at once against the shared client."""
+    mock_chain.ainvoke.return_value = "Concurrent answer."
+    questions = [f"Question {i}?" for i in range(3)]
 
-    expected_formatted_history = [HumanMessage(content="Q1"), AIMessage(content="A1")]
-    expected_input_to_chain = {"input": query_data["question"], "chat_history": expected_formatted_history}
+    responses = await asyncio.gather(*(async_client.post("/chat", json={"question": q}) for q in questions))
 
-    # Act
-    response = client.post("/chat", json=query_data)
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert [r.json()["updated_history"] for r in responses] == [[[q, "Concurrent answer."]] for q in questions]
+    assert mock_chain.ainvoke.await_count == len(questions)
 
-    # Assert
-    assert response.status_code == 200
-    response_json = response.json()
-    
-    # Check that the right language fallback message is used based on detected language
-    # Since our test question is in English, expect the English fallback message
-    assert response_json["answer"] == "I'm sorry, I couldn't find an answer to this question."
-    
-    # Compare history against the expected JSON format (list of lists)
-    assert response_json["updated_history"] == [list(item) for item in initial_history]
-    mock_create_chain.assert_called_once()
-    mock_chain.ainvoke.assert_awaited_once_with(expected_input_to_chain)
-
-# Patch the NEW chain creation function for error tests
-@patch('backend.src.main.create_conversational_rag_chain')
-def test_chat_endpoint_dependency_error(mock_create_chain, client):
+async def test_chat_endpoint_dependency_error(mock_create_chain, async_client):
     """Test handling of known dependency errors (e.g., Weaviate)."""
     # Arrange
     error_message = "Test Weaviate connection failure"
@@ -128,7 +117,7 @@ def test_chat_endpoint_dependency_error(mock_create_chain, client):
     query_data = {"question": "A valid question"} # History defaults to []
 
     # Act
-    response = client.post("/chat", json=query_data)
+    response = await async_client.post("/chat", json=query_data)
 
     # Assert
     assert response.status_code == 503 # Service Unavailable
@@ -138,49 +127,26 @@ def test_chat_endpoint_dependency_error(mock_create_chain, client):
     assert error_message in response_json["detail"]
     mock_create_chain.assert_called_once()
 
-@patch('backend.src.main.create_conversational_rag_chain')
-def test_chat_endpoint_unexpected_error(mock_create_chain, client):
-    """Test handling of unexpected errors during chain invocation."""
-    # Arrange
-    mock_chain = AsyncMock()
-    mock_chain.ainvoke.side_effect = Exception("Something totally unexpected happened")
-    mock_create_chain.return_value = mock_chain
-
-    query_data = {"question": "Another question", "chat_history": [("PrevQ", "PrevA")]}
-    expected_formatted_history = [HumanMessage(content="PrevQ"), AIMessage(content="PrevA")]
-    expected_input_to_chain = {"input": query_data["question"], "chat_history": expected_formatted_history}
-
-    # Act
-    response = client.post("/chat", json=query_data)
-
-    # Assert
-    assert response.status_code == 500 # Internal Server Error
-    response_json = response.json()
-    assert "detail" in response_json
-    assert response_json["detail"] == "Internal server error while processing the chat query."
-    mock_create_chain.assert_called_once()
-    mock_chain.ainvoke.assert_called_once_with(expected_input_to_chain)
-
-def test_chat_endpoint_invalid_input_history_format(client):
+async def test_chat_endpoint_invalid_input_history_format(async_client):
     """Test response when chat_history format is invalid."""
     # Arrange
     # History should be List[Tuple[str, str]]
     invalid_query_data = {"question": "Valid Q", "chat_history": ["just a string", ("ok tuple",)]}
 
     # Act
-    response = client.post("/chat", json=invalid_query_data)
+    response = await async_client.post("/chat", json=invalid_query_data)
 
     # Assert
     assert response.status_code == 422 # Unprocessable Entity (due to Pydantic validation)
 
 # Original invalid input test still valid
-def test_chat_endpoint_invalid_input_missing_question(client):
+async def test_chat_endpoint_invalid_input_missing_question(async_client):
     """Test response when request body is invalid (missing question)."""
     # Arrange
     invalid_query_data = {"chat_history": []} # Missing 'question'
 
     # Act
-    response = client.post("/chat", json=invalid_query_data)
+    response = await async_client.post("/chat", json=invalid_query_data)
 
     # Assert
     assert response.status_code == 422 # Unprocessable Entity
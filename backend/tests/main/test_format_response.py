@@ -1,23 +1,21 @@
 import unittest
-from backend.src.main import format_response
+import pytest
+from backend.src.main import format_response, _AMOUNT_RE
+
+@pytest.mark.parametrize("response", [
+    "The scheme provides ₹2.5 lakh for housing in rural areas.",
+    "Eligible farmers receive Rs. 6,000 per year under PM-KISAN.",
+    "A subsidy of Rs 1,20,000 is available for housing construction.",
+    "Women entrepreneurs can get loans up to ₹10 lakhs under PMEGP.",
+])
+def test_format_response_monetary_values_hindi(response):
+    """Test that monetary values are properly highlighted in Hindi responses."""
+    formatted = format_response(response, language="hi")
+    assert formatted != response, "Response should be formatted"
+    assert "<strong>" in formatted, "Formatting should include HTML tags"
 
 class TestFormatResponse(unittest.TestCase):
-    
-    def test_format_response_monetary_values_hindi(self):
-        """Test that monetary values are properly highlighted in Hindi responses."""
-        # Test with various monetary formats
-        test_responses = [
-            "The scheme provides ₹2.5 lakh for housing in rural areas.",
-            "Eligible farmers receive Rs. 6,000 per year under PM-KISAN.",
-            "A subsidy of Rs 1,20,000 is available for housing construction.",
-            "Women entrepreneurs can get loans up to ₹10 lakhs under PMEGP."
-        ]
-        
-        for response in test_responses:
-            formatted = format_response(response, language="hi")
-            self.assertNotEqual(formatted, response, "Response should be formatted")
-            self.assertIn("<strong>", formatted, "Formatting should include HTML tags")
-            
+
     def test_format_response_monetary_values_english(self):
         """Test that monetary values are properly highlighted in English responses."""
         test_response = "Eligible farmers receive Rs. 6,000 per year under PM-KISAN."
@@ -55,6 +53,13 @@ class TestFormatResponse(unittest.TestCase):
         self.assertTrue(formatted.startswith("You may be eligible for <strong>₹2.5 lakh</strong>."), 
                          "English response should prepend amount")
         
+    def test_format_response_amount_in_first_sentence_not_prepended(self):
+        """An amount already in the first sentence is highlighted in place, not repeated."""
+        test_response = "You will receive Rs 6,000 per year! Apply at the Gram Panchayat office."
+
+        formatted = format_response(test_response, language="en")
+        self.assertEqual(formatted, "You will receive <strong>Rs 6,000</strong> per year! Apply at the Gram Panchayat office.")
+        
     def test_format_response_mixed_content(self):
         """Test formatting with mixed content including scheme names and monetary values."""
         test_response = "Under Pradhan Mantri Awas Yojana (PMAY), you can receive ₹2.5 lakh for housing construction. Additionally, SC/ST beneficiaries may get Rs 70,000 extra support."
@@ -64,4 +69,26 @@ class TestFormatResponse(unittest.TestCase):
         
         # Verify monetary values are highlighted
         self.assertIn("<strong>₹2.5 lakh</strong>", formatted)
-        self.assertIn("<strong>Rs 70,000</strong>", formatted) 
\ No newline at end of file
+        self.assertIn("<strong>Rs 70,000</strong>", formatted)
+
+    def test_amount_regex_matches_supported_formats(self):
+        """The precompiled amount pattern matches every supported currency/unit format."""
+        for amount in ["₹2.5 lakh", "Rs. 6,000", "Rs 1,20,000", "₹10,000", "INR 5000", "₹50 हज़ार", "₹1 crore"]:
+            match = _AMOUNT_RE.search(f"You can get {amount} under this scheme")
+            self.assertIsNotNone(match, amount)
+            self.assertEqual(match.group(0), amount)
+
+    def test_format_response_long_pathological_response(self):
+        """A ~10 KB answer full of near-miss amounts is highlighted exactly (no catastrophic backtracking)."""
+        unit = "Rs. 1,000,000,000 lakh and Rs.,,,,,,,, then ₹ 5 "
+        highlighted = "<strong>Rs. 1,000,000,000 lakh</strong> and <strong>Rs.,,,,,,,,</strong> then <strong>₹ 5</strong> "
+
+        formatted = format_response(unit * 250, language="en")  # ~10 KB
+
+        self.assertEqual(formatted, "You may be eligible for <strong>Rs. 1,000,000,000 lakh</strong>. " + highlighted * 250)
+
+    def test_format_response_repeated_amount_highlighted_once(self):
+        """An amount that appears twice is wrapped once per occurrence, not nested."""
+        formatted = format_response("You get ₹5,000 now and ₹5,000 later.", language="en")
+        self.assertEqual(formatted.count("<strong>₹5,000</strong>"), 2)
+        self.assertNotIn("<strong><strong>", formatted)
@@ -0,0 +1,67 @@
+"""
+Shared fixtures for the RAG tests.
+
+Loading the real spaCy pipeline takes hundreds of milliseconds, so a single
+fake model is installed for the whole session and any test that reaches
+get_spacy_nlp() without patching it gets the fake instead.
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.src.rag import chain
+from backend.src.rag.vector_store import clear_retrieval_cache
+
+
+class FakeDoc:
+    """Lightweight stand-in for a LangChain Document in retrieval tests.
+
+    A plain slotted class is far cheaper to build than MagicMock and has no
+    auto-created attributes, so a misspelt field fails loudly.
+    """
+    __slots__ = ('page_content', 'metadata')
+
+    def __init__(self, page_content: str, metadata: Optional[Dict[str, Any]] = None):
+        self.page_content = page_content
+        self.metadata = metadata if metadata is not None else {}
+
+    def __repr__(self):
+        return f"FakeDoc({self.page_content!r})"
+
+
+@pytest.fixture(scope="session")
+def _session_fake_nlp():
+    """A fake spaCy model: calling it returns a doc with no named entities."""
+    fake = MagicMock(name="FakeSpacyNLP")
+    fake.return_value.ents = []
+    return fake
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fake_spacy(_session_fake_nlp):
+    """Replaces chain's spaCy loader once per session and resets the model cache."""
+    mp = pytest.MonkeyPatch()
+    # Swap only the name bound in chain, so the real spacy module is untouched
+    mp.setattr(chain, "spacy", SimpleNamespace(load=MagicMock(return_value=_session_fake_nlp)))
+    chain._load_spacy_nlp.cache_clear()
+    yield _session_fake_nlp
+    mp.undo()
+    chain._load_spacy_nlp.cache_clear()
+
+
+@pytest.fixture
+def fake_nlp(_fake_spacy):
+    """The session fake model, reset so each test can configure its own entities."""
+    _fake_spacy.reset_mock()
+    _fake_spacy.return_value.ents = []
+    return _fake_spacy
+
+
+@pytest.fixture(autouse=True)
+def _clear_retrieval_cache():
+    """Keeps cached retrieval results from leaking between tests."""
+    clear_retrieval_cache()
+    yield
+    clear_retrieval_cache()
@@ -1,11 +1,14 @@
 """Tests for the conversational RAG chain construction."""
 
+import re
+import time
 import pytest
 import unittest
-from unittest.mock import patch, MagicMock, ANY # ANY helps check prompt types
+from unittest.mock import patch, MagicMock, AsyncMock, ANY # ANY helps check prompt types
 
 # Import necessary LangChain components to check types/structure
 from langchain_core.runnables import RunnableSequence, RunnablePassthrough, RunnableLambda
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 
@@ -14,6 +17,7 @@ from langchain_core.documents import Document
 
 # Import the NEW function to test
 from backend.src.rag.chain import create_conversational_rag_chain
+from backend.tests.rag.conftest import FakeDoc
 
 # Remove old test for format_docs as it's no longer used directly
 # def test_format_docs(): ...
@@ -82,6 +86,53 @@ def test_create_conversational_rag_chain_structure(
     assert isinstance(conversational_chain, RunnableSequence) # Check it's a runnable sequence
     # Further checks on conversational_chain.steps would be more complex due to mocks/internals.
 
+@pytest.mark.parametrize("chat_history, expected_retrieval_query", [
+    ([], "What is PM Kisan?"),
+    ([HumanMessage(content="Tell me about farmer schemes"), AIMessage(content="PM Kisan is one.")],
+     "rephrased: PM Kisan eligibility"),
+])
+@patch('backend.src.rag.chain.enhanced_retrieval_step')
+@patch('backend.src.rag.chain.create_stuff_documents_chain')
+@patch('backend.src.rag.chain.get_chat_model')
+def test_conversational_chain_rephrases_only_with_history(
+    mock_get_chat_model, mock_create_stuff_chain, mock_enhanced_retrieval,
+    chat_history, expected_retrieval_query
+):
+    """The rephrase LLM call is skipped on the first turn (empty chat history)."""
+    llm = FakeListChatModel(responses=["rephrased: PM Kisan eligibility"])
+    mock_get_chat_model.return_value = llm
+    mock_create_stuff_chain.return_value = RunnableLambda(lambda x: "answer")
+    mock_enhanced_retrieval.return_value = []
+
+    chain = create_conversational_rag_chain()
+    result = chain.invoke({"input": "What is PM Kisan?", "chat_history": chat_history})
+
+    assert result == "answer"
+    mock_enhanced_retrieval.assert_called_once_with({"input": expected_retrieval_query})
+
+@patch('backend.src.rag.chain.extract_key_entities', return_value=["पेंशन"])
+@patch('backend.src.rag.chain.get_retriever')
+@patch('backend.src.rag.chain.create_stuff_documents_chain')
+@patch('backend.src.rag.chain.get_chat_model')
+async def test_conversational_chain_ainvoke_uses_async_retrieval(
+    mock_get_chat_model, mock_create_stuff_chain, mock_get_retriever, mock_extract_entities
+):
+    """Awaiting the chain takes the async retrieval path instead of blocking calls."""
+    mock_get_chat_model.return_value = FakeListChatModel(responses=["unused"])
+    mock_create_stuff_chain.return_value = RunnableLambda(lambda x: [doc.page_content for doc in x["context"]])
+    retriever = mock_get_retriever.return_value
+    retriever.ainvoke = AsyncMock(return_value=[FakeDoc("Pension overview")])
+    retriever.abatch = AsyncMock(return_value=[[FakeDoc("Pension amount")]])
+
+    chain = create_conversational_rag_chain()
+    result = await chain.ainvoke({"input": "pension", "chat_history": []})
+
+    assert result == ["Pension overview", "Pension amount"]
+    retriever.ainvoke.assert_awaited_once_with("pension")
+    retriever.abatch.assert_awaited_once()
+    retriever.invoke.assert_not_called()
+    retriever.batch.assert_not_called()
+
 # Note: Testing the actual *invocation* logic (how history is formatted and passed)
 # is better handled in the integration tests (test_main_chat.py) where we control
 # the input dictionary and mock the chain's final response.
@@ -135,11 +186,11 @@ def test_contextualize_q_prompt_standalone():
 # --- Tests for Helper Functions ---
 
 @pytest.mark.skip(reason="Need to mock spacy model/output")
-@patch('backend.src.rag.chain.get_spacy_nlp')
-def test_extract_key_entities_ner(mock_get_nlp):
+def test_extract_key_entities_ner(fake_nlp):
     """Test the NER entity extraction logic with domain-specific enhancements."""
     # Arrange
-    mock_nlp = MagicMock()
+    # fake_nlp is the session-wide spaCy stand-in from conftest.py
+    mock_nlp = fake_nlp
     # Define mock entities spaCy should return
     mock_ent1 = MagicMock() 
     mock_ent1.text = "Pradhan Mantri Kisan Samman Nidhi"
@@ -150,13 +201,10 @@ def test_extract_key_entities_ner(mock_get_nlp):
     mock_ent3 = MagicMock()
     mock_ent3.text = "help"
     mock_ent3.label_ = "MISC"
-    mock_doc = MagicMock()
-    mock_doc.ents = [mock_ent1, mock_ent2, mock_ent3]
-    mock_nlp.return_value = mock_doc
-    mock_get_nlp.return_value = mock_nlp
+    mock_nlp.return_value.ents = [mock_ent1, mock_ent2, mock_ent3]
 
     query = "PM kisan details for Bihar किसान scheme"
-    documents = [MagicMock(page_content="Info about Pradhan Mantri Kisan Samman Nidhi for farmers in Bihar. The scheme provides ₹6000 annually.")]
+    documents = [FakeDoc("Info about Pradhan Mantri Kisan Samman Nidhi for farmers in Bihar. The scheme provides ₹6000 annually.")]
     
     # We expect "help" to be filtered out as a common term, but we should get:
     # - The scheme name from NER
@@ -170,7 +218,6 @@ def test_extract_key_entities_ner(mock_get_nlp):
     extracted_entities = extract_key_entities(query, documents)
 
     # Assert
-    mock_get_nlp.assert_called_once()
     # Assert that the text passed to nlp contains query and doc content
     mock_nlp.assert_called_once()
     call_args, _ = mock_nlp.call_args
@@ -178,9 +225,10 @@ def test_extract_key_entities_ner(mock_get_nlp):
     assert documents[0].page_content in call_args[0]
     
     # Check that all expected entities are extracted
-    # The actual order may differ due to prioritization
-    for expected_entity in expected_entities_subset:
-        assert any(expected_entity in entity for entity in extracted_entities), f"Expected '{expected_entity}' in extracted entities"
+    # The actual order may differ due to prioritization; join once and scan that
+    joined_entities = "\n".join(extracted_entities)
+    missing = [expected for expected in expected_entities_subset if expected not in joined_entities]
+    assert not missing, f"Missing expected entities: {missing}"
     
     # Check entity count (should be limited to 5)
     assert len(extracted_entities) <= 5
@@ -195,7 +243,7 @@ def test_regex_entity_extraction_fallback(mock_get_nlp):
     # Query with Hindi and English elements
     query = "आवास योजना में कितना पैसा मिलता है? (How much money in housing scheme?)"
     documents = [
-        MagicMock(page_content="प्रधानमंत्री आवास योजना में लाभार्थी को ₹1,20,000 की राशि मिलती है। The beneficiary gets ₹1,20,000 in PM Housing Scheme.")
+        FakeDoc("प्रधानमंत्री आवास योजना में लाभार्थी को ₹1,20,000 की राशि मिलती है। The beneficiary gets ₹1,20,000 in PM Housing Scheme.")
     ]
     
     # These are key entities we expect to find with regex extraction
@@ -210,12 +258,8 @@ def test_regex_entity_extraction_fallback(mock_get_nlp):
     print(f"Extracted entities: {extracted_entities}")
     
     # Check if any extracted entity contains any of our expected terms
-    found_entities = set()
-    for expected_entity in expected_entities_subset:
-        for entity in extracted_entities:
-            if expected_entity.lower() in entity.lower():
-                found_entities.add(expected_entity)
-                break
+    joined_entities = "\n".join(extracted_entities).lower()
+    found_entities = {expected for expected in expected_entities_subset if expected.lower() in joined_entities}
     
     # Assert that we found at least some of our expected entities
     assert len(found_entities) > 0, f"No expected entities found. Extracted: {extracted_entities}"
@@ -224,6 +268,92 @@ def test_regex_entity_extraction_fallback(mock_get_nlp):
     # Confirm NLP wasn't used
     mock_get_nlp.assert_called_once()
 
+@patch('backend.src.rag.chain.spacy.load', side_effect=OSError("model not installed"))
+def test_get_spacy_nlp_caches_failed_load(mock_spacy_load):
+    """A missing spaCy model is looked up once, not on every extraction call."""
+    from backend.src.rag.chain import get_spacy_nlp, _load_spacy_nlp
+    _load_spacy_nlp.cache_clear()
+    try:
+        assert get_spacy_nlp() is None
+        assert get_spacy_nlp() is None
+        mock_spacy_load.assert_called_once()
+    finally:
+        _load_spacy_nlp.cache_clear()
+
+def test_get_spacy_nlp_loads_once_under_concurrency():
+    """Concurrent first calls share a single model load."""
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.src.rag.chain import get_spacy_nlp, _load_spacy_nlp
+
+    loaded_model = object()
+    def slow_load(name):
+        time.sleep(0.05)
+        return loaded_model
+
+    _load_spacy_nlp.cache_clear()
+    try:
+        with patch('backend.src.rag.chain.spacy.load', side_effect=slow_load) as mock_spacy_load:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda _: get_spacy_nlp(), range(8)))
+        assert all(result is loaded_model for result in results)
+        mock_spacy_load.assert_called_once()
+    finally:
+        _load_spacy_nlp.cache_clear()
+
+def _dictionary_entities_by_substring_scan(text):
+    """Reference behaviour: one substring check per SCHEME_ENTITIES term plus its bilingual pair."""
+    from backend.src.rag.chain import SCHEME_ENTITIES
+    entities = set()
+    lowered = text.lower()
+    for terms in SCHEME_ENTITIES.values():
+        for index, term in enumerate(terms):
+            if term.lower() in lowered:
+                partner = index + 1 if index % 2 == 0 else index - 1
+                entities.update([term] + ([terms[partner]] if 0 <= partner < len(terms) else []))
+    return entities
+
+@pytest.mark.parametrize("text", [
+    "प्रधानमंत्री आवास योजना के तहत घर",   # overlapping terms: प्रधानमंत्री आवास / आवास योजना
+    "SKILL DEVELOPMENT training for Women", # shorter term sharing a start position
+    "Floods damaged crops; apply for compensation at the block office",
+    "नमस्ते",
+])
+def test_dictionary_matcher_matches_substring_scan(text):
+    """The single-pass dictionary matcher finds exactly what per-term substring checks found."""
+    from backend.src.rag.chain import _DICTIONARY_TERM_RE, _DICTIONARY_HITS
+    found = set()
+    for match in _DICTIONARY_TERM_RE.finditer(text.lower()):
+        found.update(_DICTIONARY_HITS[match.group(1)])
+
+    assert found == _dictionary_entities_by_substring_scan(text)
+
+def _regex_fallback_terms_by_per_term_search(text):
+    """Reference behaviour: one case-insensitive \\b-anchored search per SCHEME_ENTITIES term."""
+    from backend.src.rag.chain import SCHEME_ENTITIES
+    return {
+        term
+        for terms in SCHEME_ENTITIES.values()
+        for term in terms
+        if re.search(r'\b' + re.escape(term) + r'\b', text, re.IGNORECASE)
+    }
+
+@pytest.mark.parametrize("text", [
+    "प्रधानमंत्री आवास योजना के तहत घर",
+    "SKILL DEVELOPMENT training for Women", # shorter term sharing a start position
+    "Homeless families, a housing scheme and home loans", # no match inside a longer word
+    "Floods damaged crops; apply for Medical insurance at the block office",
+    "नमस्ते",
+])
+def test_category_term_patterns_match_per_term_search(text):
+    """The per-category alternations find exactly what per-term \\b searches found."""
+    from backend.src.rag.chain import _CATEGORY_TERM_PATTERNS
+    found = set()
+    for pattern, hits_by_term in _CATEGORY_TERM_PATTERNS.values():
+        for match in pattern.finditer(text):
+            found.update(hits_by_term[match.group(1).lower()])
+
+    assert found == _regex_fallback_terms_by_per_term_search(text)
+
 # Test the contextual follow-up query generation
 def test_generate_contextual_follow_up_query():
     """Test generating context-appropriate follow-up queries for different entity types."""
@@ -263,7 +393,48 @@ def test_generate_contextual_follow_up_query():
     assert "राहत" in disaster_query
     assert "compensation" in disaster_query
 
-# TODO: Add tests for deduplicate_chunks if not covered elsewhere
+def test_deduplicate_chunks_keeps_first_occurrence_in_order():
+    """Duplicates by page_content are dropped; surviving chunks keep their order."""
+    from backend.src.rag.chain import deduplicate_chunks
+    docs = [
+        Document(page_content="A", metadata={"source": "first.pdf"}),
+        Document(page_content="B"),
+        Document(page_content="A", metadata={"source": "second.pdf"}),
+        Document(page_content="C"),
+        Document(page_content="B"),
+    ]
+
+    result = deduplicate_chunks(docs)
+
+    assert [doc.page_content for doc in result] == ["A", "B", "C"]
+    assert result[0].metadata == {"source": "first.pdf"}
+
+def test_generate_contextual_follow_up_query_is_memoized():
+    """Repeated entities outside the dictionary reuse the cached follow-up query."""
+    from backend.src.rag.chain import generate_contextual_follow_up_query, _build_follow_up_query
+    _build_follow_up_query.cache_clear()
+
+    first = generate_contextual_follow_up_query("PM Kisan")
+    second = generate_contextual_follow_up_query("PM Kisan")
+
+    assert first == second
+    info = _build_follow_up_query.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+def test_generate_contextual_follow_up_query_uses_precomputed_table():
+    """Dictionary terms resolve from the import-time table without rebuilding the query."""
+    from backend.src.rag.chain import (
+        generate_contextual_follow_up_query, _build_follow_up_query, _KNOWN_ENTITY_QUERIES, SCHEME_ENTITIES
+    )
+    assert set(_KNOWN_ENTITY_QUERIES) == {term for terms in SCHEME_ENTITIES.values() for term in terms}
+    _build_follow_up_query.cache_clear()
+
+    query = generate_contextual_follow_up_query("बाढ़")
+
+    assert query == _KNOWN_ENTITY_QUERIES["बाढ़"]
+    assert "राहत" in query
+    assert _build_follow_up_query.cache_info().misses == 0
+
 # Test the enhanced retrieval step
 @patch('backend.src.rag.chain.get_retriever')
 @patch('backend.src.rag.chain.extract_key_entities')
@@ -293,15 +464,18 @@ def test_enhanced_retrieval_step(mock_extract_entities, mock_get_retriever):
         "₹6000": [Document(page_content="Amount distributed under PM Kisan")]
     }
     
-    # Configure mock_retriever to return different docs based on query
-    def side_effect(query):
-        # Find which entity is in the query
-        for entity in mock_entities:
-            if entity in query:
-                return follow_up_docs[entity]
-        return initial_docs
+    # Follow-up searches go through a single batch call, one result list per query
+    def batch_side_effect(queries, **kwargs):
+        results = []
+        for query in queries:
+            # Find which entity is in the query
+            for entity in mock_entities:
+                if entity in query:
+                    results.append(follow_up_docs[entity])
+                    break
+        return results
     
-    mock_retriever.invoke.side_effect = side_effect
+    mock_retriever.batch.side_effect = batch_side_effect
     
     # Act
     result = enhanced_retrieval_step({"input": "Tell me about PM Kisan benefits for farmers"})
@@ -315,33 +489,21 @@ def test_enhanced_retrieval_step(mock_extract_entities, mock_get_retriever):
     # Check that the first argument was the query
     assert mock_extract_entities.call_args[0][0] == "Tell me about PM Kisan benefits for farmers"
     
-    # Verify call count (1 initial + number of entities follow-up)
-    expected_call_count = 1 + len(mock_entities)
-    assert mock_retriever.invoke.call_count == expected_call_count
+    # Verify one initial search plus a single batched follow-up round-trip
+    mock_retriever.invoke.assert_called_once()
+    assert "PM Kisan benefits" in mock_retriever.invoke.call_args[0][0]
+    mock_retriever.batch.assert_called_once()
+    follow_up_queries = mock_retriever.batch.call_args[0][0]
+    assert len(follow_up_queries) == len(mock_entities)
+    assert mock_retriever.batch.call_args.kwargs == {"return_exceptions": True}
     
     # Verify the result contains documents
     assert len(result) > 0
     assert all(isinstance(doc, Document) for doc in result)
     
-    # Verify that for each entity, we called the retriever with a contextual query
-    call_args_list = mock_retriever.invoke.call_args_list
-    
-    # First call should be the initial query
-    first_query = call_args_list[0][0][0]
-    assert "PM Kisan benefits" in first_query
-    
-    # Check that each entity appears in at least one of the follow-up queries
-    entities_found_in_queries = set()
-    for entity in mock_entities:
-        for call in call_args_list[1:]:  # Skip the first call which is the initial query
-            args, _ = call
-            query = args[0]
-            if entity in query:
-                entities_found_in_queries.add(entity)
-                break
-    
-    # All entities should appear in follow-up queries
-    assert entities_found_in_queries == set(mock_entities), f"Not all entities were found in follow-up queries"
+    # Each entity's contextual query is sent in entity order
+    for entity, query in zip(mock_entities, follow_up_queries):
+        assert query == generate_contextual_follow_up_query(entity)
 
 # Tests for the standalone helper functions needed for unit testing
 class TestHelperFunctions(unittest.TestCase):
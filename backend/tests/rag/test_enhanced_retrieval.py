@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch, MagicMock
 import pytest
 from backend.src.rag.chain import enhanced_retrieval_step
+from backend.tests.rag.conftest import FakeDoc
 
 class TestEnhancedRetrieval(unittest.TestCase):
     
@@ -15,16 +16,16 @@ class TestEnhancedRetrieval(unittest.TestCase):
             "₹2.5 lakh"
         ]
         
-        # Setup mock for document search
-        mock_docs = [MagicMock(page_content=f"Doc {i}") for i in range(5)]
+        # Setup documents for the searches
+        mock_docs = [FakeDoc(f"Doc {i}") for i in range(5)]
         
         # Setup retriever mock
         mock_retriever = MagicMock()
         mock_get_retriever.return_value = mock_retriever
         
-        # Configure the retriever to return different documents based on the call order
-        mock_retriever.invoke.side_effect = [
-            mock_docs[:3],  # Initial search results
+        # Initial search results, then one batched result list per entity
+        mock_retriever.invoke.return_value = mock_docs[:3]
+        mock_retriever.batch.return_value = [
             [mock_docs[3]],  # Results for first entity
             [mock_docs[4]]   # Results for second entity
         ]
@@ -37,7 +38,9 @@ class TestEnhancedRetrieval(unittest.TestCase):
         
         # Verify the pipeline execution
         mock_get_retriever.assert_called_once()
-        self.assertEqual(mock_retriever.invoke.call_count, 3, "Should perform initial search plus one per entity")
+        self.assertEqual(mock_retriever.invoke.call_count, 1, "Should perform a single initial search")
+        mock_retriever.batch.assert_called_once()
+        self.assertEqual(len(mock_retriever.batch.call_args[0][0]), 2, "Should batch one follow-up query per entity")
         mock_extract_entities.assert_called_once()
         
         # Verify results - we should have some documents returned
@@ -49,7 +52,7 @@ class TestEnhancedRetrieval(unittest.TestCase):
         """Test retrieval when no entities are found."""
         # Setup mocks
         mock_extract_entities.return_value = []
-        mock_docs = [MagicMock(page_content=f"Doc {i}") for i in range(3)]
+        mock_docs = [FakeDoc(f"Doc {i}") for i in range(3)]
         
         # Setup retriever mock
         mock_retriever = MagicMock()
@@ -66,10 +69,80 @@ class TestEnhancedRetrieval(unittest.TestCase):
         mock_get_retriever.assert_called_once()
         mock_extract_entities.assert_called_once()
         self.assertEqual(mock_retriever.invoke.call_count, 1, "Should only perform initial search")
+        mock_retriever.batch.assert_not_called()
         
         # Verify results - should return initial search results
         self.assertEqual(len(retrieved_docs), 3, "Should return only initial search results")
     
+    @patch('backend.src.rag.chain.extract_key_entities')
+    @patch('backend.src.rag.chain.get_retriever')
+    def test_enhanced_retrieval_follow_up_error_isolated(self, mock_get_retriever, mock_extract_entities):
+        """Test that a failing follow-up search does not drop the other entities' results."""
+        mock_extract_entities.return_value = ["पेंशन", "आपदा"]
+        initial_doc = FakeDoc("Initial result")
+        disaster_doc = FakeDoc("Disaster relief details")
+
+        mock_retriever = MagicMock()
+        mock_get_retriever.return_value = mock_retriever
+        mock_retriever.invoke.return_value = [initial_doc]
+        mock_retriever.batch.return_value = [ConnectionError("vector DB timeout"), [disaster_doc]]
+
+        retrieved_docs = enhanced_retrieval_step({"input": "pension after flood"})
+
+        self.assertEqual(retrieved_docs, [initial_doc, disaster_doc])
+
+    @patch('backend.src.rag.chain.STRONG_MATCH_MIN_SCORE', 0.8)
+    @patch('backend.src.rag.chain.extract_key_entities')
+    @patch('backend.src.rag.chain.get_retriever')
+    def test_enhanced_retrieval_strong_match_skips_follow_ups(self, mock_get_retriever, mock_extract_entities):
+        """Test that confident initial results bypass entity extraction when the gate is enabled."""
+        strong_docs = [FakeDoc("PM Awas eligibility"), FakeDoc("PM Awas amount")]
+        mock_retriever = MagicMock()
+        mock_get_retriever.return_value = mock_retriever
+        mock_retriever.invoke_with_scores.return_value = [(strong_docs[0], 0.95), (strong_docs[1], 0.81)]
+
+        retrieved_docs = enhanced_retrieval_step({"input": "PM Awas eligibility"})
+
+        self.assertEqual(retrieved_docs, strong_docs)
+        mock_extract_entities.assert_not_called()
+        mock_retriever.batch.assert_not_called()
+        mock_retriever.invoke.assert_not_called()
+
+    @patch('backend.src.rag.chain.STRONG_MATCH_MIN_SCORE', 0.8)
+    @patch('backend.src.rag.chain.extract_key_entities')
+    @patch('backend.src.rag.chain.get_retriever')
+    def test_enhanced_retrieval_weak_match_expands(self, mock_get_retriever, mock_extract_entities):
+        """Test that one weak initial result keeps the entity follow-up searches."""
+        mock_extract_entities.return_value = ["पेंशन"]
+        initial_docs = [FakeDoc("Pension overview"), FakeDoc("Loosely related")]
+        follow_up_doc = FakeDoc("Pension amount details")
+        mock_retriever = MagicMock()
+        mock_get_retriever.return_value = mock_retriever
+        mock_retriever.invoke_with_scores.return_value = [(initial_docs[0], 0.9), (initial_docs[1], 0.4)]
+        mock_retriever.batch.return_value = [[follow_up_doc]]
+
+        retrieved_docs = enhanced_retrieval_step({"input": "pension"})
+
+        self.assertEqual(retrieved_docs, initial_docs + [follow_up_doc])
+        mock_extract_entities.assert_called_once_with("pension", initial_docs)
+
+    @patch('backend.src.rag.chain.ENTITY_FOLLOW_UPS', False)
+    @patch('backend.src.rag.chain.extract_key_entities')
+    @patch('backend.src.rag.chain.get_retriever')
+    def test_enhanced_retrieval_single_deep_search(self, mock_get_retriever, mock_extract_entities):
+        """Test that disabling follow-ups issues one deeper search and no entity work."""
+        docs = [FakeDoc(f"Doc {i}") for i in range(4)]
+        mock_get_retriever.return_value.invoke.return_value = docs + [FakeDoc("Doc 0")]
+
+        with patch('backend.src.rag.chain.DEEP_RETRIEVAL_K', 12):
+            retrieved_docs = enhanced_retrieval_step({"input": "flood compensation"})
+
+        mock_get_retriever.assert_called_once_with(search_kwargs={"k": 12})
+        mock_get_retriever.return_value.invoke.assert_called_once_with("flood compensation")
+        mock_get_retriever.return_value.batch.assert_not_called()
+        mock_extract_entities.assert_not_called()
+        self.assertEqual(retrieved_docs, docs)
+
     @patch('backend.src.rag.chain.extract_key_entities')
     @patch('backend.src.rag.chain.get_retriever')
     def test_enhanced_retrieval_deduplication(self, mock_get_retriever, mock_extract_entities):
@@ -80,17 +153,15 @@ class TestEnhancedRetrieval(unittest.TestCase):
         ]
         
         # Create documents with some duplicates (same page_content)
-        doc1 = MagicMock(page_content="Housing scheme details")
-        doc2 = MagicMock(page_content="Eligibility criteria")
-        doc3 = MagicMock(page_content="Housing scheme details")  # Duplicate of doc1
+        doc1 = FakeDoc("Housing scheme details")
+        doc2 = FakeDoc("Eligibility criteria")
+        doc3 = FakeDoc("Housing scheme details")  # Duplicate of doc1
         
         # Setup retriever mock
         mock_retriever = MagicMock()
         mock_get_retriever.return_value = mock_retriever
-        mock_retriever.invoke.side_effect = [
-            [doc1, doc2],  # Initial search
-            [doc3]          # Entity search (duplicate)
-        ]
+        mock_retriever.invoke.return_value = [doc1, doc2]  # Initial search
+        mock_retriever.batch.return_value = [[doc3]]  # Entity search (duplicate)
         
         # Test query
         query = "Housing scheme details"
@@ -100,4 +171,4 @@ class TestEnhancedRetrieval(unittest.TestCase):
         
         # Verify deduplication
         self.assertTrue(len(retrieved_docs) < 3, "Should deduplicate documents with same content")
-        self.assertTrue(all(isinstance(d, MagicMock) for d in retrieved_docs), "Should return MagicMock objects") 
\ No newline at end of file
+        self.assertTrue(all(isinstance(d, FakeDoc) for d in retrieved_docs), "Should return the retrieved documents") 
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""Tests for the retrieval result cache in front of the Weaviate retriever."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.src.rag import vector_store as vector_store_module
+from backend.src.rag.vector_store import CachingRetriever, clear_retrieval_cache
+from backend.tests.rag.conftest import FakeDoc
+
+
+@pytest.fixture
+def inner_retriever():
+    # spec keeps the batched-embedding path (which needs .vectorstore) out of these tests
+    inner = MagicMock(name="VectorStoreRetriever", spec=["invoke", "batch"])
+    inner.invoke.side_effect = lambda query, config=None: [FakeDoc(f"result for {query}")]
+    inner.batch.side_effect = lambda queries, config=None, return_exceptions=False: [
+        [FakeDoc(f"result for {query}")] for query in queries
+    ]
+    return inner
+
+
+@pytest.fixture
+def retriever(inner_retriever):
+    return CachingRetriever(inner_retriever, "similarity", {"k": 3})
+
+
+def test_invoke_repeated_query_hits_cache(retriever, inner_retriever):
+    first = retriever.invoke("PM Kisan eligibility")
+    second = retriever.invoke("PM Kisan eligibility")
+
+    assert [doc.page_content for doc in second] == ["result for PM Kisan eligibility"]
+    assert first == second and first is not second  # callers get their own list
+    inner_retriever.invoke.assert_called_once()
+
+
+def test_cache_key_includes_search_settings(inner_retriever):
+    CachingRetriever(inner_retriever, "similarity", {"k": 3}).invoke("आवास योजना")
+    CachingRetriever(inner_retriever, "similarity", {"k": 5}).invoke("आवास योजना")
+
+    assert inner_retriever.invoke.call_count == 2
+
+
+def test_batch_only_fetches_misses(retriever, inner_retriever):
+    retriever.invoke("cached query")
+
+    results = retriever.batch(["cached query", "new query"], return_exceptions=True)
+
+    assert [[doc.page_content for doc in docs] for docs in results] == [
+        ["result for cached query"], ["result for new query"]
+    ]
+    inner_retriever.batch.assert_called_once_with(["new query"], None, return_exceptions=True)
+
+
+def test_batch_failures_are_returned_but_not_cached(retriever, inner_retriever):
+    error = ConnectionError("vector DB timeout")
+    inner_retriever.batch.side_effect = [[error], [[FakeDoc("recovered")]]]
+
+    assert retriever.batch(["flaky query"], return_exceptions=True) == [error]
+    retried = retriever.batch(["flaky query"], return_exceptions=True)
+
+    assert [doc.page_content for doc in retried[0]] == ["recovered"]
+    assert inner_retriever.batch.call_count == 2
+
+
+def test_least_recently_used_entry_is_evicted(inner_retriever):
+    retriever = CachingRetriever(inner_retriever, "similarity", {"k": 3}, maxsize=2)
+    retriever.invoke("a")
+    retriever.invoke("b")
+    retriever.invoke("a")  # refresh "a" so "b" is the oldest
+    retriever.invoke("c")
+
+    retriever.invoke("a")
+    retriever.invoke("b")
+
+    assert [call.args[0] for call in inner_retriever.invoke.call_args_list] == ["a", "b", "c", "b"]
+
+
+def test_clear_retrieval_cache(retriever, inner_retriever):
+    retriever.invoke("PM Awas")
+    clear_retrieval_cache()
+    retriever.invoke("PM Awas")
+
+    assert inner_retriever.invoke.call_count == 2
+
+
+def test_zero_maxsize_disables_caching(inner_retriever):
+    retriever = CachingRetriever(inner_retriever, "similarity", {"k": 3}, maxsize=0)
+    retriever.invoke("PM Awas")
+    retriever.invoke("PM Awas")
+
+    assert inner_retriever.invoke.call_count == 2
+
+
+
+def test_expired_entries_are_fetched_again(inner_retriever, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(vector_store_module.time, "monotonic", lambda: now[0])
+    retriever = CachingRetriever(inner_retriever, "similarity", {"k": 3}, ttl=60)
+    retriever.invoke("PM Awas")
+    now[0] += 59
+    retriever.invoke("PM Awas")
+    assert inner_retriever.invoke.call_count == 1
+
+    now[0] += 2
+    retriever.invoke("PM Awas")
+    assert inner_retriever.invoke.call_count == 2
+
+
+def test_retriever_composes_as_runnable(retriever, inner_retriever):
+    chain = retriever | (lambda docs: [doc.page_content for doc in docs])
+
+    assert chain.invoke("PM Awas") == ["result for PM Awas"]
+    docs = retriever.with_config(run_name="cached_retriever").invoke("PM Awas")
+    assert [doc.page_content for doc in docs] == ["result for PM Awas"]
+    inner_retriever.invoke.assert_called_once()
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_batch_embeds_misses_in_one_call():
+    embeddings = FakeEmbeddings()
+    vector_store = MagicMock(name="WeaviateVectorStore")
+    vector_store.embeddings = embeddings
+    vector_store.similarity_search.side_effect = lambda query, vector, k: [FakeDoc(f"{query}:{vector[0]:g}")]
+    inner = MagicMock(name="VectorStoreRetriever", spec=["invoke", "batch", "vectorstore"])
+    inner.vectorstore = vector_store
+    retriever = CachingRetriever(inner, "similarity", {"k": 3})
+
+    results = retriever.batch(["PM Awas", "पेंशन राशि"], return_exceptions=True)
+
+    assert embeddings.batches == [["PM Awas", "पेंशन राशि"]]
+    assert [docs[0].page_content for docs in results] == ["PM Awas:7", "पेंशन राशि:10"]
+    vector_store.similarity_search.assert_any_call("PM Awas", vector=[7.0], k=3)
+    inner.batch.assert_not_called()
+
+
+def test_batch_embedding_failure_returned_per_query():
+    vector_store = MagicMock(name="WeaviateVectorStore")
+    vector_store.embeddings.embed_documents.side_effect = RuntimeError("model unavailable")
+    inner = MagicMock(name="VectorStoreRetriever", spec=["invoke", "batch", "vectorstore"])
+    inner.vectorstore = vector_store
+    retriever = CachingRetriever(inner, "similarity", {"k": 3})
+
+    results = retriever.batch(["a", "b"], return_exceptions=True)
+
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    vector_store.similarity_search.assert_not_called()
+
+
+def test_invoke_with_scores_is_cached_separately_from_invoke(inner_retriever):
+    vector_store = MagicMock(name="WeaviateVectorStore")
+    vector_store.similarity_search_with_score.return_value = [(FakeDoc("PM Awas"), 0.9)]
+    inner_retriever.vectorstore = vector_store
+    retriever = CachingRetriever(inner_retriever, "similarity", {"k": 3})
+
+    retriever.invoke("PM Awas")
+    first = retriever.invoke_with_scores("PM Awas")
+    second = retriever.invoke_with_scores("PM Awas")
+
+    assert [(doc.page_content, score) for doc, score in second] == [("PM Awas", 0.9)]
+    assert first == second
+    vector_store.similarity_search_with_score.assert_called_once_with("PM Awas", k=3)
+
+
+async def test_async_calls_share_the_cache(retriever, inner_retriever):
+    await retriever.ainvoke("PM Awas")
+    results = await retriever.abatch(["PM Awas", "पेंशन"], return_exceptions=True)
+
+    assert [docs[0].page_content for docs in results] == ["result for PM Awas", "result for पेंशन"]
+    inner_retriever.invoke.assert_called_once()
+    inner_retriever.batch.assert_called_once_with(["पेंशन"], None, return_exceptions=True)
+
+
+def test_batch_searches_run_on_bounded_shared_pool(monkeypatch):
+    """Searches of a batch share the module pool, so at most its worker count run at once."""
+    active, peak, lock = [0], [0], threading.Lock()
+    barrier = threading.Barrier(2)  # Each search waits for a second one to be running
+
+    def search(query, vector, k):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        barrier.wait(timeout=5)
+        with lock:
+            active[0] -= 1
+        return [FakeDoc(query)]
+
+    vector_store = MagicMock(name="WeaviateVectorStore")
+    vector_store.embeddings = FakeEmbeddings()
+    vector_store.similarity_search.side_effect = search
+    inner = MagicMock(name="VectorStoreRetriever", spec=["invoke", "batch", "vectorstore"])
+    inner.vectorstore = vector_store
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        monkeypatch.setattr(vector_store_module, "_search_executor", pool)
+        results = CachingRetriever(inner, "similarity", {"k": 3}).batch(["a", "b", "c", "d"], return_exceptions=True)
+
+    assert [docs[0].page_content for docs in results] == ["a", "b", "c", "d"]
+    assert peak[0] == 2
@@ -2,30 +2,32 @@ import pytest
 import hashlib
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi import UploadFile, BackgroundTasks
-from fastapi.testclient import TestClient
 from pathlib import Path
 import io
 import asyncio # Import asyncio for checks
 from backend.src.exceptions import WeaviateConnectionError
 import os
+from functools import lru_cache
 
 # Import the FastAPI app instance from your main module
 # Adjust the import path based on your project structure
 from backend.src.main import app, calculate_file_hash, check_hash_exists, run_processing_pipeline
 
-# Create a TestClient instance
-client = TestClient(app)
+@lru_cache(maxsize=128)
+def _expected_sha(content: bytes) -> str:
+    """Reference SHA256 for test content, computed once per distinct payload."""
+    return hashlib.sha256(content).hexdigest()
 
-# Fixture for a mock UploadFile
-@pytest.fixture
+# Fixture for a mock UploadFile (built once; rewound before each test)
+@pytest.fixture(scope="session")
 def mock_upload_file():
     content = b"This is a test PDF content."
     file = io.BytesIO(content)
     upload_file = UploadFile(filename="test.pdf", file=file)
     return upload_file, content
 
-# Fixture for a mock Weaviate client
-@pytest.fixture
+# Fixture for a mock Weaviate client (built once; reset before each test)
+@pytest.fixture(scope="session")
 def mock_weaviate_client():
     mock = MagicMock()
     mock.is_connected.return_value = True
@@ -47,11 +49,25 @@ def mock_weaviate_client():
 
     mock_collection_instance.query = mock_query
     mock_collection_instance.data = mock_data
-    mock_collections.get.return_value = mock_collection_instance
+    # Look collections up by name: an unexpected collection name fails with KeyError
+    collections_by_name = {"YojnaChunk": mock_collection_instance}
+    mock_collections.get.side_effect = collections_by_name.__getitem__
     mock.collections = mock_collections
 
     return mock, mock_response # Return mock response too for modification
 
+@pytest.fixture(autouse=True)
+def reset_shared_mocks(mock_upload_file, mock_weaviate_client):
+    """Returns the session-scoped fixtures to their initial state for each test."""
+    upload_file, _ = mock_upload_file
+    upload_file.file.seek(0)
+    mock, mock_response = mock_weaviate_client
+    # Drops recorded calls but keeps the configured return values. The collection
+    # is only reachable through the get() side_effect, so it is reset explicitly
+    mock.collections.get("YojnaChunk").reset_mock()
+    mock.reset_mock()
+    mock_response.objects = []
+
 # Fixture for mock BackgroundTasks
 @pytest.fixture
 def mock_background_tasks():
@@ -68,12 +84,26 @@ def mock_background_tasks():
 async def test_calculate_file_hash(mock_upload_file):
     """Test SHA256 hash calculation."""
     upload_file, content = mock_upload_file
-    expected_hash = hashlib.sha256(content).hexdigest()
-    actual_hash = await calculate_file_hash(upload_file)
+    expected_hash = _expected_sha(content)
+    actual_hash, actual_content = await calculate_file_hash(upload_file)
     assert actual_hash == expected_hash
+    assert actual_content == content
     # Ensure file pointer is reset
     assert upload_file.file.tell() == 0
 
+@pytest.mark.asyncio
+async def test_calculate_file_hash_multiple_chunks():
+    """Test that content spanning several read chunks hashes the same as one buffer."""
+    from backend.src.main import HASH_CHUNK_SIZE
+    content = b"%PDF-1.4 " + bytes(range(256)) * (HASH_CHUNK_SIZE // 256 * 2 + 3)
+    upload_file = UploadFile(filename="large.pdf", file=io.BytesIO(content))
+
+    actual_hash, actual_content = await calculate_file_hash(upload_file)
+
+    assert actual_hash == _expected_sha(content)
+    assert actual_content == content
+    assert upload_file.file.tell() == 0
+
 @pytest.mark.asyncio
 async def test_check_hash_exists_does_not_exist(mock_weaviate_client):
     """Test hash check when hash does not exist."""
@@ -82,7 +112,7 @@ async def test_check_hash_exists_does_not_exist(mock_weaviate_client):
     exists = await check_hash_exists(client, "non_existent_hash")
     assert exists is False
     client.collections.get.assert_called_once_with("YojnaChunk")
-    client.collections.get().query.fetch_objects.assert_called_once()
+    client.collections.get("YojnaChunk").query.fetch_objects.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_check_hash_exists_exists(mock_weaviate_client):
@@ -92,7 +122,7 @@ async def test_check_hash_exists_exists(mock_weaviate_client):
     exists = await check_hash_exists(client, "existent_hash")
     assert exists is True
     client.collections.get.assert_called_once_with("YojnaChunk")
-    client.collections.get().query.fetch_objects.assert_called_once()
+    client.collections.get("YojnaChunk").query.fetch_objects.assert_called_once()
 
 @pytest.mark.asyncio
 @patch('backend.src.main.get_weaviate_client')
@@ -104,7 +134,8 @@ async def test_process_pdf_endpoint_new_file(
     mock_check_hash,
     mock_calc_hash,
     mock_get_client,
-    mock_upload_file
+    mock_upload_file,
+    client
     # Removed mock_background_tasks fixture from signature
 ):
     """Test /process-pdf endpoint when file hash is new."""
@@ -113,9 +144,8 @@ async def test_process_pdf_endpoint_new_file(
 
     # Mock return values
     mock_get_client_instance = MagicMock()
-    mock_get_client_instance.close = MagicMock() # Mock the close method needed in finally block
     mock_get_client.return_value = mock_get_client_instance # Use instance for check
-    mock_calc_hash.return_value = test_hash
+    mock_calc_hash.return_value = (test_hash, content)
     mock_check_hash.return_value = False # Simulate hash doesn't exist
 
     # Remove dependency override block
@@ -130,6 +160,8 @@ async def test_process_pdf_endpoint_new_file(
     assert json_response["status"] == "processing_scheduled"
     assert json_response["filename"] == upload_file.filename
     assert json_response["document_hash"] == test_hash
+    assert response.headers["X-Yojna-Status"] == json_response["status"]
+    assert response.headers["X-Yojna-Document-Hash"] == test_hash
 
     mock_calc_hash.assert_called_once()
     mock_get_client.assert_called_once()
@@ -139,8 +171,8 @@ async def test_process_pdf_endpoint_new_file(
     mock_add_task.assert_called_once_with(
         run_processing_pipeline, content, upload_file.filename, test_hash
     )
-    # Check that the client used for checking was closed
-    mock_get_client_instance.close.assert_called_once()
+    # The shared client is left open for later requests
+    mock_get_client_instance.close.assert_not_called()
 
     # Clean up dependency override (if any were set elsewhere, good practice)
     app.dependency_overrides = {}
@@ -154,7 +186,8 @@ async def test_process_pdf_endpoint_existing_file(
     mock_check_hash,
     mock_calc_hash,
     mock_get_client,
-    mock_upload_file
+    mock_upload_file,
+    client
     # Removed mock_background_tasks fixture from signature
 ):
     """Test /process-pdf endpoint when file hash already exists."""
@@ -163,9 +196,8 @@ async def test_process_pdf_endpoint_existing_file(
 
     # Mock return values
     mock_get_client_instance = MagicMock()
-    mock_get_client_instance.close = MagicMock() # Mock the close method needed in finally block
     mock_get_client.return_value = mock_get_client_instance # Use instance for check
-    mock_calc_hash.return_value = test_hash
+    mock_calc_hash.return_value = (test_hash, content)
     mock_check_hash.return_value = True # Simulate hash *does* exist
 
     # No BackgroundTasks involved or overridden when file exists
@@ -177,13 +209,15 @@ async def test_process_pdf_endpoint_existing_file(
     assert json_response["status"] == "exists"
     assert json_response["filename"] == upload_file.filename
     assert json_response["document_hash"] == test_hash
+    assert response.headers["X-Yojna-Status"] == json_response["status"]
+    assert response.headers["X-Yojna-Document-Hash"] == test_hash
 
     mock_calc_hash.assert_called_once()
     mock_get_client.assert_called_once()
     # Assert check_hash_exists was called with the specific client instance
     mock_check_hash.assert_called_once_with(mock_get_client_instance, test_hash)
-    # Check that the client used for checking was closed
-    mock_get_client_instance.close.assert_called_once()
+    # The shared client is left open for later requests
+    mock_get_client_instance.close.assert_not_called()
     # Ensure add_task was not called (we don't need to patch it or assert on it directly here)
 
     # Clean up dependency override
@@ -220,7 +254,7 @@ def test_run_processing_pipeline_success(
     mock_process_pdf.assert_called_once_with(Path(mock_temp_file_obj.name))
     mock_get_client.assert_called_once()
     mock_batch_import.assert_called_once_with(mock_client_instance, mock_chunks, file_hash)
-    mock_client_instance.close.assert_called_once()
+    mock_client_instance.close.assert_not_called()
     # Check if temp file unlink was attempted (needs mocking Path.unlink)
     # TODO: Add mock for Path.unlink if detailed cleanup verification is needed
 
@@ -256,70 +290,4 @@ def test_run_processing_pipeline_processing_error(
     mock_batch_import.assert_not_called()
     # TODO: Add check for logging the error
 
-# Add more tests for other error cases in run_processing_pipeline (e.g., Weaviate errors) 
-
-@pytest.mark.asyncio
-@patch('backend.src.main.create_conversational_rag_chain')
-async def test_chat_endpoint_success_format(mock_create_chain):
-    """Test the /chat endpoint, verifying mock execution and response format."""
-    import asyncio
-    
-    # --- Mock Setup --- # 
-    # 1. Define the result we want ainvoke to return
-    mock_result = {
-        'answer': 'This is a mock AI answer.',
-        'chat_history': [
-            ["Test question?", "This is a mock AI answer."]
-        ] 
-    }
-
-    # 2. Create an AsyncMock to represent the chain instance
-    mock_chain_instance = AsyncMock()
-    # Configure AsyncMock to return the result when awaited
-    mock_chain_instance.ainvoke.return_value = mock_result
-    
-    # 3. Configure the patched factory to return our prepared mock chain instance
-    mock_create_chain.return_value = mock_chain_instance
-    # --- End Mock Setup --- #
-
-    request_data = {
-        "question": "Test question?",
-        "chat_history": []
-    }
-
-    # For CI environment compatibility
-    try:
-        # Use TestClient more carefully in CI environment
-        print("\n--- Making request with TestClient --- ")
-        with TestClient(app) as client:
-            response = client.post("/chat", json=request_data)
-        print(f"--- TestClient response status: {response.status_code} ---")
-        
-        # --- Assertions --- #
-        # 1. Verify the mock was called with expected arguments
-        mock_create_chain.assert_called_once()
-        mock_chain_instance.ainvoke.assert_called_once()
-        
-        # 2. Verify the response status and content
-        assert response.status_code == 200, f"Expected 200 OK, got {response.status_code}. Response: {response.text}"
-        response_json = response.json()
-        assert "answer" in response_json
-        assert "updated_history" in response_json
-        assert response_json["answer"] == "This is a mock AI answer."
-
-        # Assert the structure of updated_history
-        assert isinstance(response_json["updated_history"], list)
-        assert len(response_json["updated_history"]) == 1
-        first_turn = response_json["updated_history"][0]
-        assert isinstance(first_turn, list)
-        assert len(first_turn) == 2
-        assert isinstance(first_turn[0], str)
-        assert isinstance(first_turn[1], str)
-        assert first_turn[0] == "Test question?"
-        assert first_turn[1] == "This is a mock AI answer."
-    except Exception as e:
-        print(f"Exception during test: {str(e)}")
-        # Re-raise to ensure the test still fails on actual issues
-        raise
-
-# ... (rest of test_main.py) ... 
\ No newline at end of file
+# Add more tests for other error cases in run_processing_pipeline (e.g., Weaviate errors)
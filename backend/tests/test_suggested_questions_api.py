@@ -1,17 +1,13 @@
 import pytest
-from fastapi.testclient import TestClient
 import sys
 import os
 
 # Add the parent directory to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.main import app
 from src.schemas import SuggestedQuestion
 
-client = TestClient(app)
-
-def test_suggested_questions_schema():
+def test_suggested_questions_schema(client):
     """Test the suggested questions API schema validation."""
     # Create test data
     test_data = {
@@ -42,7 +38,7 @@ def test_suggested_questions_schema():
         assert isinstance(suggestion["id"], str)
         assert isinstance(suggestion["text"], str)
 
-def test_suggested_questions_handles_errors():
+def test_suggested_questions_handles_errors(client):
     """Test that the endpoint handles errors gracefully."""
     # Create test data with potentially problematic inputs
     test_data = {
@@ -18,23 +18,32 @@ from src.services.suggestion_service import (
 from src.schemas import SuggestedQuestion
 
 class TestSuggestionService:
-    def test_extract_entities(self):
+    @pytest.mark.parametrize("text, key, expected", [
+        # Scheme names
+        ("Pradhan Mantri Awas Yojana provides housing benefits.", "schemes", ["Pradhan Mantri Awas Yojana"]),
+        # Monetary amounts
+        ("You can get ₹50,000 under this scheme.", "amounts", ["₹"]),
+        # Documents
+        ("You need Aadhaar and ration card for verification.", "documents", ["Aadhaar", "ration card"]),
+    ])
+    def test_extract_entities(self, text, key, expected):
         """Test entity extraction from text."""
-        # Test with scheme names
-        text = "Pradhan Mantri Awas Yojana provides housing benefits."
         entities = extract_entities(text)
-        assert "Pradhan Mantri Awas Yojana" in entities["schemes"]
-        
-        # Test with monetary amounts
-        text = "You can get ₹50,000 under this scheme."
-        entities = extract_entities(text)
-        assert "₹" in entities["amounts"][0]
-        
-        # Test with documents
-        text = "You need Aadhaar and ration card for verification."
-        entities = extract_entities(text)
-        assert "Aadhaar" in entities["documents"]
-        assert "ration card" in entities["documents"]
+        for value in expected:
+            assert any(value in entity for entity in entities[key]), (value, entities[key])
+    
+    def test_extract_entities_result_is_not_shared(self):
+        """Each call returns its own lists, with attribute and item access."""
+        text = "Pradhan Mantri Awas Yojana needs Aadhaar."
+        first = extract_entities(text)
+        first["documents"].append("PAN")
+
+        second = extract_entities(text)
+
+        assert second.documents == ["Aadhaar"]
+        assert second["schemes"] == ["Pradhan Mantri Awas Yojana"]
+        with pytest.raises(KeyError):
+            second["unknown"]
     
     def test_detect_language(self):
         """Test language detection functionality."""
@@ -80,6 +89,22 @@ class TestSuggestionService:
         # Should still work with Hindi
         assert len(questions) > 0
     
+    def test_prefilled_templates_leave_only_scheme(self):
+        """Templates are translated and pre-filled at import, with {scheme} left to substitute."""
+        from src.services.suggestion_service import _PREFILLED_TEMPLATES
+        assert _PREFILLED_TEMPLATES[("ELIGIBILITY", "hi")] == "क्या मैं my situation होने पर {scheme} के लिए पात्र हूँ?"
+        assert _PREFILLED_TEMPLATES[("DOCUMENTS", "hi")] == "What documents do I need to apply for {scheme}?"
+    
+    def test_render_history(self):
+        """Chat history renders as one User/Assistant line per message."""
+        from src.services.suggestion_service import _render_history
+        chat_history = [
+            {"role": "user", "content": "Tell me about PMAY"},
+            {"role": "assistant", "content": "It's a housing scheme."}
+        ]
+        assert _render_history(chat_history) == "User: Tell me about PMAY\nAssistant: It's a housing scheme.\n"
+        assert _render_history([]) == ""
+    
     @pytest.mark.asyncio
     async def test_generate_contextual_questions(self):
         """Test LLM-based contextual question generation."""
@@ -118,6 +143,11 @@ class TestSuggestionService:
             assert "documents" in questions[0].text.lower()
             assert "eligibility" in questions[1].text.lower()
     
+    def test_default_llm_is_shared(self):
+        """Calls without an explicit llm reuse one ChatAnthropic instance."""
+        from src.services.suggestion_service import _default_llm
+        assert _default_llm() is _default_llm()
+    
     @pytest.mark.asyncio
     async def test_generate_suggestions_integration(self):
         """Test the main suggestion generation function."""
@@ -149,9 +179,57 @@ class TestSuggestionService:
                 chat_history=chat_history
             )
             
+            # Both generators run (concurrently) and contextual questions come first
+            mock_template.assert_called_once()
+            mock_contextual.assert_awaited_once()
+            assert [s.id for s in suggestions] == ["c1", "c2", "c3", "t1"]
+
             # Should prioritize contextual questions and limit to 5
             assert len(suggestions) <= 5
             
             # Contextual questions should come first
             if len(suggestions) > 0 and suggestions[0].id.startswith("c"):
-                assert suggestions[0].text == "Contextual question 1" 
\ No newline at end of file
+                assert suggestions[0].text == "Contextual question 1" 
+
+@pytest.mark.asyncio
+async def test_generate_suggestions_shares_in_flight_request():
+    """Concurrent identical requests make a single LLM call and get the same questions."""
+    import asyncio
+    release = asyncio.Event()
+
+    async def slow_contextual(*args, **kwargs):
+        await release.wait()
+        return [SuggestedQuestion(id="c1", text="Contextual question 1")]
+
+    with patch('src.services.suggestion_service.generate_contextual_questions',
+               AsyncMock(side_effect=slow_contextual)) as mock_contextual:
+        chat_history = [{"role": "user", "content": "Question"}]
+        calls = [
+            asyncio.ensure_future(generate_suggestions("What is PM Awas Yojana?", "It's a housing scheme.", chat_history))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*calls)
+
+    mock_contextual.assert_awaited_once()
+    assert all(result[0].id == "c1" for result in results)
+    # Finished requests are not kept around
+    from src.services.suggestion_service import _in_flight_suggestions
+    assert not _in_flight_suggestions
+
+def test_drop_repeated_templates_only_checks_against_contextual():
+    """Templates repeating a contextual question (up to case/punctuation/a trailing word) are dropped."""
+    from src.services.suggestion_service import _drop_repeated_templates
+    contextual = [
+        SuggestedQuestion(id="c1", text="What documents do I need to apply for PM Awas Yojana?"),
+        # Overlaps c1, but contextual questions are always kept
+        SuggestedQuestion(id="c2", text="What documents do I need to apply for PM Awas Yojana online?"),
+    ]
+    templates = [
+        SuggestedQuestion(id="t1", text="what documents do I need to apply for PM Awas Yojana"),
+        SuggestedQuestion(id="t2", text="Who is eligible for PM Awas Yojana?"),
+        SuggestedQuestion(id="t3", text="Where is the nearest office to apply for PM Awas Yojana?"),
+    ]
+
+    assert [q.id for q in _drop_repeated_templates(contextual, templates)] == ["t2", "t3"]
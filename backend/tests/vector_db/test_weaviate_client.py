@@ -3,7 +3,7 @@ from pytest_mock import MockerFixture
 import weaviate
 from typing import List
 import numpy as np
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 from weaviate.exceptions import WeaviateBaseError
 from weaviate.collections.classes.batch import BatchObjectReturn, ErrorObject
 
@@ -11,13 +11,16 @@ from backend.src.schemas import DocumentChunk
 from backend.src.exceptions import WeaviateConnectionError, WeaviateSchemaError, WeaviateStorageError, WeaviateQueryError
 
 # Mock config before importing the module
-@pytest.fixture(scope="function", autouse=True)
-def mock_config(monkeypatch):
-    """Mock the config module to avoid using real configuration during tests."""
-    mock_config = MagicMock()
-    mock_config.WEAVIATE_URL = "http://localhost:8080"
-    monkeypatch.setattr("backend.src.config.WEAVIATE_URL", "http://localhost:8080")
-    return mock_config
+@pytest.fixture(scope="module", autouse=True)
+def mock_config():
+    """Points config at a local Weaviate URL once for the whole module.
+
+    Module rather than session scope so the patch is undone before other test
+    modules run; tests needing another URL override it with their own monkeypatch.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("backend.src.config.WEAVIATE_URL", "http://localhost:8080")
+        yield
 
 # Import the module after mocking
 from backend.src.vector_db import weaviate_client
@@ -29,22 +32,13 @@ def mock_weaviate_client_v4(mocker: MockerFixture) -> MagicMock:
     mock_client = mocker.MagicMock(spec=weaviate.WeaviateClient)
     mocker.patch.object(weaviate, 'connect_to_local', return_value=mock_client)
     mocker.patch.object(weaviate, 'connect_to_custom', return_value=mock_client)
+    # Start every test without a shared client left over from another test
+    mocker.patch.object(weaviate_client, '_cached_client', None)
     
-    # Create a detailed mock for collections
-    mock_collections = mocker.MagicMock()
-    mock_collection = mocker.MagicMock()
-    mock_data = mocker.MagicMock()
-    mock_batch = mocker.MagicMock()
-    
-    # Set up the get method to return the mock_collection
-    mock_collections.get.return_value = mock_collection
-    
-    # Set up the collection mock objects
-    mock_collection.data = mock_data
-    mock_collection.batch = mock_batch
-    
-    # Set the collections attribute on the client mock
-    mock_client.collections = mock_collections
+    # `collections` is an instance attribute, so the class spec doesn't provide it.
+    # Everything below it (get() -> collection -> data/batch/config/query) is
+    # created lazily by the mock the first time a test touches it
+    mock_client.collections = mocker.MagicMock()
     
     # Ensure connect/ready methods work
     mock_client.is_ready.return_value = True  # Default is ready (override in specific tests)
@@ -65,7 +59,6 @@ def sample_chunks_with_embeddings() -> List[DocumentChunk]:
 def test_get_weaviate_client_success(mocker: MockerFixture, mock_weaviate_client_v4):
     """Tests successful connection returns the client."""
     # Arrange
-    mocker.patch.dict(weaviate_client.config.__dict__, {"WEAVIATE_URL": "http://localhost:8080"})
     mock_weaviate_client_v4.is_ready.return_value = True
 
     # Act
@@ -76,9 +69,9 @@ def test_get_weaviate_client_success(mocker: MockerFixture, mock_weaviate_client
     weaviate.connect_to_local.assert_called_once()
     client.connect.assert_called_once()
 
-def test_get_weaviate_client_custom_url_success(mocker: MockerFixture, mock_weaviate_client_v4):
+def test_get_weaviate_client_custom_url_success(monkeypatch, mock_weaviate_client_v4):
     """Tests successful connection with a custom URL."""
-    mocker.patch.dict(weaviate_client.config.__dict__, {"WEAVIATE_URL": "http://otherhost:9090"})
+    monkeypatch.setattr(weaviate_client.config, "WEAVIATE_URL", "http://otherhost:9090")
     mock_weaviate_client_v4.is_ready.return_value = True
 
     client = weaviate_client.get_weaviate_client()
@@ -92,7 +85,6 @@ def test_get_weaviate_client_custom_url_success(mocker: MockerFixture, mock_weav
 
 def test_get_weaviate_client_not_ready(mocker: MockerFixture, mock_weaviate_client_v4):
     """Tests WeaviateConnectionError if client is not ready."""
-    mocker.patch.dict(weaviate_client.config.__dict__, {"WEAVIATE_URL": "http://localhost:8080"})
     mock_weaviate_client_v4.is_ready.return_value = False
 
     with pytest.raises(WeaviateConnectionError, match="is not ready"):
@@ -102,7 +94,6 @@ def test_get_weaviate_client_not_ready(mocker: MockerFixture, mock_weaviate_clie
 
 def test_get_weaviate_client_connect_exception(mocker: MockerFixture, mock_weaviate_client_v4):
     """Tests WeaviateConnectionError if connect() raises an exception."""
-    mocker.patch.dict(weaviate_client.config.__dict__, {"WEAVIATE_URL": "http://localhost:8080"})
     mock_weaviate_client_v4.connect.side_effect = WeaviateBaseError("Connection refused")
 
     with pytest.raises(WeaviateConnectionError, match="Connection refused"):
@@ -110,6 +101,47 @@ def test_get_weaviate_client_connect_exception(mocker: MockerFixture, mock_weavi
 
     mock_weaviate_client_v4.close.assert_called_once()
 
+def test_get_weaviate_client_reuses_connected_client(mock_weaviate_client_v4):
+    """Within the TTL the shared client is returned without reconnecting or a readiness check."""
+    first = weaviate_client.get_weaviate_client()
+    mock_weaviate_client_v4.is_ready.reset_mock()
+
+    assert weaviate_client.get_weaviate_client() is first
+    weaviate.connect_to_local.assert_called_once()
+    mock_weaviate_client_v4.is_ready.assert_not_called()
+
+def test_get_weaviate_client_rechecks_after_ttl(mocker: MockerFixture, mock_weaviate_client_v4):
+    """Past the TTL the shared client is reused only if it is still ready."""
+    weaviate_client.get_weaviate_client()
+    mocker.patch.object(weaviate_client, '_cached_at', -weaviate_client.CLIENT_HEALTH_CHECK_TTL_SECONDS)
+    mock_weaviate_client_v4.is_ready.reset_mock()
+
+    weaviate_client.get_weaviate_client()
+
+    mock_weaviate_client_v4.is_ready.assert_called_once()
+    weaviate.connect_to_local.assert_called_once()
+
+def test_get_weaviate_client_reconnects_when_disconnected(mock_weaviate_client_v4):
+    """A shared client that lost its connection is replaced by a new one."""
+    weaviate_client.get_weaviate_client()
+    mock_weaviate_client_v4.is_connected.return_value = False
+    # The fresh connection reports connected again once connect() has run
+    mock_weaviate_client_v4.connect.side_effect = lambda: setattr(mock_weaviate_client_v4.is_connected, "return_value", True)
+
+    weaviate_client.get_weaviate_client()
+
+    assert weaviate.connect_to_local.call_count == 2
+
+def test_close_weaviate_client(mock_weaviate_client_v4):
+    """Closing the shared client makes the next call reconnect."""
+    weaviate_client.get_weaviate_client()
+
+    weaviate_client.close_weaviate_client()
+
+    mock_weaviate_client_v4.close.assert_called_once()
+    weaviate_client.get_weaviate_client()
+    assert weaviate.connect_to_local.call_count == 2
+
 # --- Tests for ensure_schema_exists --- #
 def test_ensure_schema_exists_already_exists(mock_weaviate_client_v4):
     """Tests schema creation is skipped if collection exists."""
@@ -138,8 +170,38 @@ def test_ensure_schema_exists_creates_new(mock_weaviate_client_v4):
     weaviate_client.ensure_schema_exists(mock_weaviate_client_v4)
 
     mock_collections.exists.assert_called_once_with(weaviate_client.CLASS_NAME)
-    mock_collections.create.assert_called_once()
-    # Could add more detailed assertions on the args passed to create if needed
+    mock_collections.create.assert_called_once_with(
+        name=weaviate_client.CLASS_NAME,
+        description=ANY,
+        vectorizer_config=ANY,
+        vector_index_config=ANY,
+        properties=ANY,
+    )
+    _, create_kwargs = mock_collections.create.call_args
+    index_config = create_kwargs["vector_index_config"]
+    assert index_config.ef == weaviate_client.HNSW_EF
+    assert index_config.efConstruction == weaviate_client.HNSW_EF_CONSTRUCTION
+    # 768-dim vectors split into segments of PQ_SEGMENT_DIMS dimensions
+    assert index_config.quantizer.segments == 768 // weaviate_client.PQ_SEGMENT_DIMS
+
+def test_ensure_schema_exists_pq_segments_follow_dimension(monkeypatch, mock_weaviate_client_v4):
+    """PQ segments are derived from the configured embedding dimension."""
+    monkeypatch.setattr(weaviate_client.config, "EMBEDDING_DIMENSION", 384)
+    mock_weaviate_client_v4.collections.exists.return_value = False
+
+    weaviate_client.ensure_schema_exists(mock_weaviate_client_v4)
+
+    _, create_kwargs = mock_weaviate_client_v4.collections.create.call_args
+    assert create_kwargs["vector_index_config"].quantizer.segments == 384 // weaviate_client.PQ_SEGMENT_DIMS
+
+def test_ensure_schema_exists_rejects_indivisible_dimension(monkeypatch, mock_weaviate_client_v4):
+    """A dimension that can't be split into whole PQ segments fails before touching Weaviate."""
+    monkeypatch.setattr(weaviate_client.config, "EMBEDDING_DIMENSION", 770)
+
+    with pytest.raises(WeaviateSchemaError, match="multiple of"):
+        weaviate_client.ensure_schema_exists(mock_weaviate_client_v4)
+
+    mock_weaviate_client_v4.collections.create.assert_not_called()
 
 def test_ensure_schema_exists_creation_error(mock_weaviate_client_v4):
     """Tests WeaviateSchemaError is raised if creation fails."""
@@ -177,67 +239,126 @@ def test_batch_import_chunks_success(mocker: MockerFixture, mock_weaviate_client
     assert inserted_objects[0].properties["chunk_id"] == "d1_c1"
     assert inserted_objects[1].properties["chunk_id"] == "d1_c2"
     assert inserted_objects[0].properties["document_hash"] == "test_success_hash"
+    # Vectors are handed to Weaviate as the chunks' own lists, without conversion
+    assert inserted_objects[0].vector is sample_chunks_with_embeddings[0].embedding
+    assert inserted_objects[1].vector == [0.2] * 768
 
-def test_batch_import_chunks_not_connected(mock_weaviate_client_v4, sample_chunks_with_embeddings):
-    """Tests WeaviateConnectionError if client is not connected."""
-    mock_weaviate_client_v4.is_connected.return_value = False
-
-    with pytest.raises(WeaviateConnectionError, match="Client is not connected"):
-        # Pass a dummy hash
-        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, sample_chunks_with_embeddings, "test_not_connected_hash")
-
-def test_batch_import_chunks_empty_list(mock_weaviate_client_v4):
-    """Tests that import is skipped for an empty list."""
+def test_batch_import_chunks_deterministic_uuids(mocker: MockerFixture, mock_weaviate_client_v4, sample_chunks_with_embeddings):
+    """Re-importing a document reuses its object UUIDs; another document gets different ones."""
     mock_weaviate_client_v4.is_connected.return_value = True
     mock_collection = mock_weaviate_client_v4.collections.get.return_value
+    mock_response = mocker.MagicMock(spec=BatchObjectReturn)
+    mock_response.has_errors = False
+    mock_response.errors = {}
+    mock_collection.data.insert_many.return_value = mock_response
 
-    # Pass a dummy hash
-    weaviate_client.batch_import_chunks(mock_weaviate_client_v4, [], "test_empty_hash")
+    def imported_uuids(document_hash):
+        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, sample_chunks_with_embeddings, document_hash)
+        return [obj.uuid for obj in mock_collection.data.insert_many.call_args[0][0]]
 
-    # Assert that insert_many was not called
-    mock_collection.data.insert_many.assert_not_called()
+    first = imported_uuids("hash_a")
+    assert imported_uuids("hash_a") == first
+    assert len(set(first)) == 2
+    assert set(imported_uuids("hash_b")).isdisjoint(first)
 
-def test_batch_import_chunks_all_skipped(mock_weaviate_client_v4):
-    """Tests that import is skipped if all chunks lack embeddings."""
-    mock_weaviate_client_v4.is_connected.return_value = True
+def test_batch_import_chunks_shards_large_imports(mocker: MockerFixture, mock_weaviate_client_v4):
+    """Large imports are split into batch_size sub-batches, each sent with insert_many."""
     mock_collection = mock_weaviate_client_v4.collections.get.return_value
-    chunks_no_embeddings = [DocumentChunk(chunk_id="c1", document_id="d1", text="t", embedding=None)]
+    mock_response = mocker.MagicMock(spec=BatchObjectReturn)
+    mock_response.has_errors = False
+    mock_response.errors = {}
+    mock_collection.data.insert_many.return_value = mock_response
+    chunks = [
+        DocumentChunk(chunk_id=f"d1_c{i}", document_id="d1", text=f"Chunk {i}", embedding=[0.1] * 768)
+        for i in range(250)
+    ]
 
-    # Pass a dummy hash
-    weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks_no_embeddings, "test_skipped_hash")
+    weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_sharded_hash", batch_size=100)
 
-    # Assert that insert_many was not called
-    mock_collection.data.insert_many.assert_not_called()
+    assert mock_collection.data.insert_many.call_count == 3
+    batch_sizes = sorted(len(call.args[0]) for call in mock_collection.data.insert_many.call_args_list)
+    assert batch_sizes == [50, 100, 100]
+    inserted_ids = {obj.properties["chunk_id"] for call in mock_collection.data.insert_many.call_args_list for obj in call.args[0]}
+    assert inserted_ids == {chunk.chunk_id for chunk in chunks}
 
-def test_batch_import_chunks_batch_errors(mocker: MockerFixture, mock_weaviate_client_v4, sample_chunks_with_embeddings):
-    """Tests WeaviateStorageError if insert_many response has errors."""
-    mock_weaviate_client_v4.is_connected.return_value = True
+def test_batch_import_chunks_aggregates_sub_batch_errors(mocker: MockerFixture, mock_weaviate_client_v4):
+    """Errors from every sub-batch are reported, indexed by position in the whole import."""
     mock_collection = mock_weaviate_client_v4.collections.get.return_value
+    chunks = [
+        DocumentChunk(chunk_id=f"d1_c{i}", document_id="d1", text=f"Chunk {i}", embedding=[0.1] * 768)
+        for i in range(5)
+    ]
 
-    # Mock the response from insert_many with errors
-    mock_response = mocker.MagicMock(spec=BatchObjectReturn)
-    mock_response.has_errors = True
-    mock_error = ErrorObject(message="Import failed", object_=None, original_uuid=None)
-    mock_response.errors = {0: mock_error} # Simulate error for the first object
-    mock_collection.data.insert_many.return_value = mock_response
+    def insert_many(objects):
+        response = mocker.MagicMock(spec=BatchObjectReturn)
+        # Fail the second object of every sub-batch that has one
+        response.errors = {1: ErrorObject(message="Import failed", object_=None, original_uuid=None)} if len(objects) > 1 else {}
+        response.has_errors = bool(response.errors)
+        return response
+    mock_collection.data.insert_many.side_effect = insert_many
 
-    with pytest.raises(WeaviateStorageError, match="1 errors occurred"):
-        # Pass a dummy hash
-        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, sample_chunks_with_embeddings, "test_batch_error_hash")
+    with pytest.raises(WeaviateStorageError, match="2 errors occurred") as exc_info:
+        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_sharded_errors_hash", batch_size=2)
 
-    mock_collection.data.insert_many.assert_called_once()
+    assert set(exc_info.value.failed_objects) == {1, 3}
 
-def test_batch_import_chunks_weaviate_exception(mocker: MockerFixture, mock_weaviate_client_v4, sample_chunks_with_embeddings):
-    """Tests WeaviateStorageError if insert_many raises a Weaviate error."""
-    mock_weaviate_client_v4.is_connected.return_value = True
-    mock_collection = mock_weaviate_client_v4.collections.get.return_value
-    mock_collection.data.insert_many.side_effect = WeaviateBaseError("DB connection lost")
+def _with_malformed_embedding(chunks: List[DocumentChunk]) -> List[DocumentChunk]:
+    chunks[1].embedding = [0.1]  # Too short
+    return chunks
+
+_FAILED_INSERT = MagicMock(
+    spec=BatchObjectReturn,
+    has_errors=True,
+    errors={0: ErrorObject(message="Import failed", object_=None, original_uuid=None)}, # First object fails
+)
+
+@pytest.mark.parametrize("scenario, expected_exc, match, inserts", [
+    pytest.param({"connected": False}, WeaviateConnectionError, "Client is not connected", 0, id="not_connected"),
+    pytest.param({"chunks": lambda chunks: []}, None, None, 0, id="empty_list"),
+    pytest.param({"chunks": lambda chunks: [chunks[2]]}, None, None, 0, id="all_skipped"),
+    pytest.param({"insert_many": lambda objects: _FAILED_INSERT}, WeaviateStorageError, "1 errors occurred", 1, id="batch_errors"),
+    pytest.param({"insert_many": WeaviateBaseError("DB connection lost")}, WeaviateStorageError, "DB connection lost", 1, id="weaviate_exception"),
+    pytest.param({"chunks": _with_malformed_embedding}, WeaviateStorageError, "wrong dimension", 0, id="malformed_vectors"),
+])
+def test_batch_import_chunks_unsuccessful(mock_weaviate_client_v4, sample_chunks_with_embeddings,
+                                          scenario, expected_exc, match, inserts):
+    """Inputs and Weaviate failures that import nothing or raise.
+
+    Each scenario adjusts the shared setup: the connection state, the chunks
+    passed in (derived from the sample chunks) and how insert_many behaves.
+    """
+    mock_weaviate_client_v4.is_connected.return_value = scenario.get("connected", True)
+    insert_many = mock_weaviate_client_v4.collections.get.return_value.data.insert_many
+    insert_many.side_effect = scenario.get("insert_many")
+    chunks = scenario.get("chunks", lambda chunks: chunks)(sample_chunks_with_embeddings)
 
-    with pytest.raises(WeaviateStorageError, match="DB connection lost"):
-        # Pass a dummy hash
-        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, sample_chunks_with_embeddings, "test_weaviate_exc_hash")
+    if expected_exc is None:
+        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_unsuccessful_hash")
+    else:
+        with pytest.raises(expected_exc, match=match):
+            weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_unsuccessful_hash")
 
-    mock_collection.data.insert_many.assert_called_once()
+    assert insert_many.call_count == inserts
+
+def test_batch_import_chunks_uses_configured_dimension(monkeypatch, mocker: MockerFixture, mock_weaviate_client_v4):
+    """Vectors are checked against config.EMBEDDING_DIMENSION, not a fixed size."""
+    monkeypatch.setattr(weaviate_client.config, "EMBEDDING_DIMENSION", 384)
+    insert_many = mock_weaviate_client_v4.collections.get.return_value.data.insert_many
+    insert_many.return_value = mocker.MagicMock(spec=BatchObjectReturn, has_errors=False, errors={})
+    chunks = [DocumentChunk(chunk_id="d1_c1", document_id="d1", text="Chunk 1 text", embedding=[0.1] * 384)]
+
+    weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_dimension_hash")
+
+    insert_many.assert_called_once()
+
+def test_batch_import_malformed_vectors_reports_chunk_ids(mock_weaviate_client_v4, sample_chunks_with_embeddings):
+    """The error for wrong-dimension vectors names the offending chunks."""
+    chunks = _with_malformed_embedding(sample_chunks_with_embeddings)
+
+    with pytest.raises(WeaviateStorageError) as exc_info:
+        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_malformed_hash")
+
+    assert exc_info.value.failed_objects == ["d1_c2"]
 
 # Test for vector similarity search
 @pytest.mark.skip(reason="Placeholder test for future functionality")
@@ -302,30 +423,6 @@ def test_vector_similarity_search(mock_weaviate_client_v4):
     collection = mock_weaviate_client_v4.collections.get.return_value
     collection.query.near_vector.assert_not_called()
 
-# Test for handling malformed vector data during import
-def test_batch_import_malformed_vectors(mock_weaviate_client_v4, sample_chunks_with_embeddings):
-    """Tests handling of malformed vector data during batch import."""
-    chunks = sample_chunks_with_embeddings.copy()
-    
-    # Modify one of the embeddings to be malformed (wrong dimension)
-    chunks[1].embedding = [0.1]  # Too short
-    
-    # Set up the mock to simulate a batch error
-    collection = mock_weaviate_client_v4.collections.get.return_value
-    mock_response = MagicMock()
-    mock_response.has_errors = True
-    mock_response.errors = {1: MagicMock(message="Invalid vector dimension")}
-    collection.data.insert_many.return_value = mock_response
-    
-    # Test the function with malformed data
-    with pytest.raises(WeaviateStorageError):
-        # Pass a dummy hash
-        weaviate_client.batch_import_chunks(mock_weaviate_client_v4, chunks, "test_malformed_hash")
-    
-    # Verify error handling
-    collection.data.insert_many.assert_called_once()
-    assert mock_weaviate_client_v4.is_connected.called
-
 # Test metadata filtering
 @pytest.mark.skip(reason="Placeholder test for future functionality")
 def test_query_with_metadata_filter(mock_weaviate_client_v4):
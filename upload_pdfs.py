@@ -5,11 +5,41 @@ Script to upload multiple PDF files in parallel to Yojna Khojna backend.
 import asyncio
 import aiohttp
 import argparse
+import hashlib
+import json
 import os
 import sys
 from pathlib import Path
 from typing import List, Dict, Any
 
+# Local record of uploaded PDFs, kept in the PDF directory: {sha256: status}.
+# Files the backend already reported as 'exists' are skipped on later runs
+MANIFEST_NAME = '.upload_manifest.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(pdf_path: Path) -> str:
+    """SHA256 of a file's contents, matching the document hash the backend computes."""
+    sha256_hash = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def load_manifest(manifest_path: Path) -> Dict[str, str]:
+    """Load the upload manifest, starting fresh if it is missing or unreadable."""
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest_path: Path, manifest: Dict[str, str]) -> None:
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
 
 async def upload_pdf(session: aiohttp.ClientSession, pdf_path: Path, backend_url: str) -> Dict[str, Any]:
     """
@@ -25,23 +55,37 @@ async def upload_pdf(session: aiohttp.ClientSession, pdf_path: Path, backend_url
     """
     url = f"{backend_url}/process-pdf"
     
-    # Create form data with the PDF file
-    form_data = aiohttp.FormData()
-    form_data.add_field('pdf_file',
-                        open(pdf_path, 'rb'),
-                        filename=pdf_path.name,
-                        content_type='application/pdf')
-    
-    print(f"Uploading {pdf_path.name}...")
-    async with session.post(url, data=form_data) as response:
-        if response.status not in (200, 202):
-            error_text = await response.text()
-            print(f"Error uploading {pdf_path.name}: {response.status} - {error_text}")
-            return {"filename": pdf_path.name, "status": "error", "error": error_text}
+    # The with block closes the file even if the request fails before aiohttp
+    # has sent it. aiohttp streams a file field in chunks, reading each one in
+    # its executor, so the PDF is never loaded whole or read on the event loop
+    with open(pdf_path, 'rb') as pdf_file:
+        # Create form data with the PDF file
+        form_data = aiohttp.FormData()
+        form_data.add_field('pdf_file',
+                            pdf_file,
+                            filename=pdf_path.name,
+                            content_type='application/pdf')
         
-        result = await response.json()
-        print(f"Successfully processed {pdf_path.name}: {result['status']}")
-        return result
+        print(f"Uploading {pdf_path.name}...")
+        async with session.post(url, data=form_data) as response:
+            if response.status not in (200, 202):
+                error_text = await response.text()
+                print(f"Error uploading {pdf_path.name}: {response.status} - {error_text}")
+                return {"filename": pdf_path.name, "status": "error", "error": error_text}
+            
+            # The backend mirrors the status into headers; use them when present
+            # so the body never has to be read and decoded
+            status = response.headers.get('X-Yojna-Status')
+            if status is not None:
+                result = {
+                    "filename": pdf_path.name,
+                    "status": status,
+                    "document_hash": response.headers.get('X-Yojna-Document-Hash'),
+                }
+            else:
+                result = await response.json()
+            print(f"Successfully processed {pdf_path.name}: {result['status']}")
+            return result
 
 
 async def upload_multiple_pdfs(pdf_paths: List[Path], backend_url: str, max_concurrent: int = 5) -> List[Dict[str, Any]]:
@@ -54,21 +98,25 @@ async def upload_multiple_pdfs(pdf_paths: List[Path], backend_url: str, max_conc
         max_concurrent: Maximum number of concurrent uploads
     
     Returns:
-        List of API responses for each PDF
+        List of API responses for each PDF, in the order the uploads finished
     """
-    # Create a semaphore to limit concurrency
-    semaphore = asyncio.Semaphore(max_concurrent)
-    
-    async def upload_with_semaphore(pdf_path: Path) -> Dict[str, Any]:
-        async with semaphore:
-            async with aiohttp.ClientSession() as session:
-                return await upload_pdf(session, pdf_path, backend_url)
-    
-    # Create tasks for all PDFs
-    tasks = [upload_with_semaphore(pdf_path) for pdf_path in pdf_paths]
-    
-    # Wait for all tasks to complete
-    results = await asyncio.gather(*tasks)
+    results = []
+    
+    async def upload_worker(session: aiohttp.ClientSession, pending_paths) -> None:
+        # Workers share one iterator, so each path is taken by exactly one of them
+        for pdf_path in pending_paths:
+            results.append(await upload_pdf(session, pdf_path, backend_url))
+            print(f"Completed {len(results)}/{len(pdf_paths)} uploads")
+    
+    # One session for all uploads so connections to the backend are kept alive
+    # and reused instead of reconnecting for every file
+    connector = aiohttp.TCPConnector(limit=max_concurrent, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # A fixed pool of workers bounds concurrency, so only max_concurrent
+        # uploads (and open files) exist at a time however many PDFs there are
+        pending_paths = iter(pdf_paths)
+        workers = [upload_worker(session, pending_paths) for _ in range(min(max_concurrent, len(pdf_paths)))]
+        await asyncio.gather(*workers)
     return results
 
 
@@ -78,6 +126,7 @@ def main():
     parser.add_argument('--backend-url', default='http://localhost:8000', help='Backend API URL')
     parser.add_argument('--max-concurrent', type=int, default=5, help='Maximum number of concurrent uploads')
     parser.add_argument('--pattern', default='*.pdf', help='File pattern to match (default: *.pdf)')
+    parser.add_argument('--force', action='store_true', help='Upload every PDF, ignoring the local upload manifest')
     
     args = parser.parse_args()
     
@@ -87,11 +136,25 @@ def main():
         print(f"Error: {args.pdf_dir} is not a valid directory")
         sys.exit(1)
     
-    pdf_files = sorted(list(pdf_dir.glob(args.pattern)))
+    pdf_files = sorted(pdf_dir.glob(args.pattern))
     if not pdf_files:
         print(f"No PDF files found in {args.pdf_dir} matching pattern {args.pattern}")
         sys.exit(1)
     
+    # Skip PDFs the backend has already confirmed as processed
+    manifest_path = pdf_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    already_uploaded = []
+    if not args.force and manifest:
+        already_uploaded = [pdf for pdf in pdf_files if manifest.get(file_sha256(pdf)) == 'exists']
+    if already_uploaded:
+        print(f"Skipping {len(already_uploaded)} PDFs already processed by the backend (use --force to re-upload)")
+        skipped = set(already_uploaded)
+        pdf_files = [pdf for pdf in pdf_files if pdf not in skipped]
+        if not pdf_files:
+            print("Nothing new to upload")
+            sys.exit(0)
+    
     print(f"Found {len(pdf_files)} PDF files to upload")
     for i, pdf in enumerate(pdf_files, 1):
         print(f"  {i}. {pdf.name}")
@@ -109,10 +172,17 @@ def main():
         args.max_concurrent
     ))
     
+    # Record confirmed uploads for the next run
+    for result in results:
+        if result.get('status') in ('exists', 'processing_scheduled') and result.get('document_hash'):
+            manifest[result['document_hash']] = result['status']
+    save_manifest(manifest_path, manifest)
+    
     # Print summary
     success_count = sum(1 for r in results if r.get('status') in ('exists', 'processing_scheduled'))
     print(f"\nUpload Summary:")
     print(f"  Total: {len(pdf_files)}")
+    print(f"  Skipped (already processed): {len(already_uploaded)}")
     print(f"  Successful: {success_count}")
     print(f"  Failed: {len(pdf_files) - success_count}")
     